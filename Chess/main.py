@@ -1,10 +1,12 @@
+import threading
 import pygame as p
-from utilities import chessengine
+from utilities import chessengine, search
 WIDTH = HEIGHT = 512
 DIMENSION = 8 
 SQ_SIZE = HEIGHT // DIMENSION
 MAX_FPS = 15 #For animation
 IMAGES = {}
+AI_THINK_TIME = 1.0 #seconds the engine may think per move
 
 """
 Initialize a global dict of images.This will be called exactly once in the main
@@ -16,6 +18,18 @@ def load_Images():
 #Note we can access image by saying IMAGES["wp"]
 
 
+#runs the engine in a background thread so the window keeps responding while it thinks. It searches its own copy
+#of the position and appends the move found (a packed move code, or None) to result
+def think(aiSearch, result):
+    result.append(aiSearch.search(timeLimit=AI_THINK_TIME))
+
+#stops the engine if it is thinking, the move it was working on is thrown away
+def stopThinking(aiSearch, aiThread):
+    if aiThread is not None:
+        aiSearch.stop()
+        aiThread.join()
+
+
 #The main driver of our code This will handle user input and update the graphics
 def main():
     p.init()
@@ -31,13 +45,21 @@ def main():
     sqSelected = () #no square selected,keep track of the last click of the user (tuple: row,cloumn)
     playerclicks = [] #keep track of player clicks (two tuples[(6,4),(4,4)])
     gameOver = False
+    playerOne = True #True if a human is playing white, False if the engine plays white
+    playerTwo = False #same as above but for black
+    aiSearch = None #search the engine is running in aiThread, None when it isn't thinking
+    aiThread = None
+    aiResult = []
     while running:
+        humanTurn = (gs.whiteTomove and playerOne) or (not gs.whiteTomove and playerTwo)
         for e in p.event.get():
             if e.type == p.QUIT:
+                stopThinking(aiSearch, aiThread)
+                aiThread = None
                 running = False
             #mouse handler
             elif e.type == p.MOUSEBUTTONDOWN:
-                if not gameOver:
+                if not gameOver and humanTurn:
                     location = p.mouse.get_pos() #(x,y) location of mouse
                     col = location[0]//SQ_SIZE
                     row = location[1]//SQ_SIZE
@@ -52,13 +74,13 @@ def main():
                     if len(playerclicks) == 2:  #means it is after the 2nd click
                         move = chessengine.Move(playerclicks[0], playerclicks[1], gs.board)
                         print(move.getChessNotation())
-                        for i in range(len(validMoves)):
-                            if move == validMoves[i]:
-                                gs.makeMove(validMoves[i])
-                                moveMade = True
-                                animate = True
-                                sqSelected = () #reset user clicks
-                                playerclicks = []
+                        validMove = validMoves.byID.get(move.moveID)
+                        if validMove is not None:
+                            gs.makeMove(validMove)
+                            moveMade = True
+                            animate = True
+                            sqSelected = () #reset user clicks
+                            playerclicks = []
                         if not moveMade:
                             playerclicks = [sqSelected]
 
@@ -66,19 +88,44 @@ def main():
             #key handler
             elif e.type == p.KEYDOWN:
                 if e.key == p.K_z: #undo when "z" is pressed 
+                    stopThinking(aiSearch, aiThread)
+                    aiThread = None
                     gs.undoMove()
+                    #against the engine take its reply back too, otherwise it would just play it again
+                    if (playerOne or playerTwo) and not ((gs.whiteTomove and playerOne) or (not gs.whiteTomove and playerTwo)):
+                        gs.undoMove()
+                    gameOver = False
+                    sqSelected = ()
+                    playerclicks = []
                     moveMade = True
                     animate = False
                 if e.key == p.K_r: #reset the board when r is pressed
+                    stopThinking(aiSearch, aiThread)
+                    aiThread = None
+                    gameOver = False
                     gs = chessengine.GameState()
                     validMoves = gs.getValidMoves()
                     sqSelected = ()
                     playerclicks = []
                     moveMade = False
                     animate = False
+        #engine move: start a search in the background and play its move once it has finished
+        if running and not gameOver and not humanTurn and not moveMade:
+            if aiThread is None:
+                aiSearch = search.Search(chessengine.GameState.deserialize(gs.serialize()))
+                aiResult = []
+                aiThread = threading.Thread(target=think, args=(aiSearch, aiResult), daemon=True)
+                aiThread.start()
+            elif not aiThread.is_alive():
+                aiThread = None
+                if aiResult and aiResult[0] is not None:
+                    gs.makeMove(aiResult[0])
+                    moveMade = True
+                    animate = True
+
         if moveMade:
             if animate:
-                animateMove(gs.movelog[-1],screen,gs.board, clock)
+                animateMove(gs.lastMove(),screen,gs.board, clock)
             validMoves = gs.getValidMoves()
             moveMade = False
             animate = False
@@ -111,9 +158,8 @@ def highlightsquares(screen, gs, validMoves, sqSelected):
             screen.blit(s, (c*SQ_SIZE, r*SQ_SIZE))
             #highlight moves from that square
             s.fill(p.Color("yellow"))
-            for move in validMoves:
-                if move.startRow == r and move.startCol == c:
-                    screen.blit(s, (move.endCol*SQ_SIZE, move.endRow*SQ_SIZE))
+            for move in validMoves.fromSquare.get((r, c), ()):
+                screen.blit(s, (move.endCol*SQ_SIZE, move.endRow*SQ_SIZE))
 """
 Responsible for all the graphics within the current gamestate
 """
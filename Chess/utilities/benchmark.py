@@ -0,0 +1,233 @@
+"""
+Engine benchmarks that perft doesn't cover, reported as JSON. Run them from the Chess folder:
+
+python -m utilities.benchmark
+python -m utilities.benchmark --benchmark memory --games 500 --plies 100
+
+memory: bytes held per live game after a number of plies, as a GameState and as a compact Position record
+makeunmake: makeMove/undoMove pairs per second over the legal moves of the perft test positions
+fen: FEN strings parsed (GameState.from_fen) and written (GameState.to_fen) per second, parsing is timed
+     with an empty row cache (first round) and with the rows cached (the other rounds)
+smp: parallel search (search.ParallelSearch) to a fixed depth on the perft test positions with 1, 2, 4... workers,
+     the combined nodes/sec of all the processes and the time-to-depth speedup over a single worker
+pruning: search to a fixed depth on the perft test positions with every selective search technique, without each
+         one of them and without any, the nodes, time and effective branching factor of the last iteration
+"""
+import argparse
+import json
+import os
+import pickle
+import random
+import sys
+import time
+import tracemalloc
+
+from utilities import chessengine
+
+
+#plays up to plies random legal moves from the starting position (fewer if the game ends)
+def playRandomGame(plies, rnd):
+    gs = chessengine.GameState()
+    for ply in range(plies):
+        moves = gs.getValidMoveCodes()
+        if not moves:
+            break
+        gs.makeMove(rnd.choice(moves))
+    return gs
+
+
+#bytes allocated while building the objects returned by build, divided by their number.
+#The objects are kept alive until the measurement is taken
+def bytesPerObject(build, count):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [build(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return round((after - before) / len(objects)) if objects else 0
+
+
+def memoryBenchmark(games=200, plies=100, seed=1):
+    rnd = random.Random(seed)
+    played = [playRandomGame(plies, rnd) for i in range(games)]
+    #GameStates are measured by replaying the same games, so the move generation isn't counted
+    records = [chessengine.Position.fromGameState(gs) for gs in played]
+    return {
+        "benchmark": "memory",
+        "games": games,
+        "plies": round(sum(len(gs.movelog) for gs in played) / games, 1),
+        "gameStateBytes": bytesPerObject(lambda i: records[i].toGameState(), games),
+        #fresh copies of the records, recording them would also count the lists of the GameStates growing
+        "positionBytes": bytesPerObject(lambda i: pickle.loads(pickle.dumps(records[i])), games),
+        "moveBytes": bytesPerObject(lambda i: played[0].lastMove(), 1000), #one Move view
+    }
+
+
+#makes and undoes every legal move of each perft test position, rounds times over
+def makeUnmakeBenchmark(rounds=1000):
+    from utilities.perft import POSITIONS, loadPosition
+    pairs = 0
+    seconds = 0.0
+    for name in POSITIONS:
+        gs = loadPosition(name)
+        moves = gs.getValidMoveCodes()
+        makeMove = gs.makeMove
+        undoMove = gs.undoMove
+        start = time.perf_counter()
+        for i in range(rounds):
+            for move in moves:
+                makeMove(move)
+                undoMove()
+        seconds += time.perf_counter() - start
+        pairs += rounds * len(moves)
+    return {
+        "benchmark": "makeunmake",
+        "pairs": pairs,
+        "seconds": round(seconds, 4),
+        "pairsPerSecond": round(pairs / seconds) if seconds > 0 else 0,
+    }
+
+
+#parses and writes the FEN of every position of a few random games, rounds times over
+def fenBenchmark(rounds=20, seed=1):
+    rnd = random.Random(seed)
+    fens = []
+    for i in range(20):
+        gs = chessengine.GameState()
+        for ply in range(100):
+            moves = gs.getValidMoveCodes()
+            if not moves:
+                break
+            gs.makeMove(rnd.choice(moves))
+            fens.append(gs.to_fen())
+    fromFen = chessengine.GameState.from_fen
+    chessengine.FEN_ROWS.clear()
+    start = time.perf_counter()
+    for fen in fens:
+        fromFen(fen)
+    coldSeconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(rounds):
+        for fen in fens:
+            fromFen(fen)
+    parseSeconds = time.perf_counter() - start
+    positions = [fromFen(fen) for fen in fens]
+    start = time.perf_counter()
+    for i in range(rounds):
+        for gs in positions:
+            gs.to_fen()
+    writeSeconds = time.perf_counter() - start
+    count = rounds * len(fens)
+    return {
+        "benchmark": "fen",
+        "fens": count,
+        "parsedPerSecond": round(count / parseSeconds) if parseSeconds > 0 else 0,
+        "coldParsedPerSecond": round(len(fens) / coldSeconds) if coldSeconds > 0 else 0,
+        "writtenPerSecond": round(count / writeSeconds) if writeSeconds > 0 else 0,
+    }
+
+
+#searches every perft test position to depth with 1, 2, 4... and finally maxWorkers processes
+def smpBenchmark(depth=4, maxWorkers=None):
+    from utilities.perft import POSITIONS, loadPosition
+    from utilities.search import ParallelSearch
+    maxWorkers = maxWorkers or os.cpu_count()
+    counts = [workers for workers in (1, 2, 4, 8, 16, 32, 64) if workers < maxWorkers] + [maxWorkers]
+    runs = []
+    for workers in counts:
+        nodes = 0
+        seconds = 0.0
+        for name in POSITIONS:
+            search = ParallelSearch(loadPosition(name), workers)
+            search.search(maxDepth=depth)
+            nodes += search.nodes
+            seconds += search.time
+        runs.append({
+            "workers": workers,
+            "nodes": nodes,
+            "seconds": round(seconds, 4),
+            "nps": round(nodes / seconds) if seconds > 0 else 0,
+            "speedup": round(runs[0]["seconds"] / seconds, 2) if runs and seconds > 0 else 1.0,
+        })
+    return {
+        "benchmark": "smp",
+        "depth": depth,
+        "cores": os.cpu_count(),
+        "runs": runs,
+    }
+
+
+#searches every perft test position to depth with the techniques in pruning
+def searchRun(depth, pruning):
+    from utilities.perft import POSITIONS, loadPosition
+    from utilities.search import Search
+    nodes = 0
+    seconds = 0.0
+    ebf = []
+    for name in POSITIONS:
+        search = Search(loadPosition(name), pruning=pruning)
+        search.search(maxDepth=depth)
+        last = search.iterations[-1]
+        nodes += last["nodes"]
+        seconds += last["time"]
+        ebf.append(last["ebf"])
+    return {
+        "pruning": list(pruning),
+        "nodes": nodes,
+        "seconds": round(seconds, 4),
+        "ebf": round(sum(ebf) / len(ebf), 2),
+    }
+
+
+def pruningBenchmark(depth=4):
+    from utilities.search import PRUNING
+    runs = [searchRun(depth, PRUNING)]
+    runs += [searchRun(depth, [name for name in PRUNING if name != off]) for off in PRUNING]
+    runs.append(searchRun(depth, ()))
+    return {
+        "benchmark": "pruning",
+        "depth": depth,
+        "runs": runs,
+    }
+
+
+BENCHMARKS = {
+    "memory": memoryBenchmark,
+    "makeunmake": makeUnmakeBenchmark,
+    "fen": fenBenchmark,
+    "smp": smpBenchmark,
+    "pruning": pruningBenchmark,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Engine benchmarks, reported as JSON")
+    parser.add_argument("--benchmark", action="append", choices=sorted(BENCHMARKS),
+                        help="benchmark to run (can be repeated, default all)")
+    parser.add_argument("--games", type=int, default=200, help="games kept in memory for the memory benchmark")
+    parser.add_argument("--plies", type=int, default=100, help="plies played in each game (default 100)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for the games played")
+    parser.add_argument("--rounds", type=int, default=1000,
+                        help="times every move is made and undone in the makeunmake benchmark (default 1000)")
+    parser.add_argument("--depth", type=int, default=4, help="search depth of the smp and pruning benchmarks (default 4)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="most processes the smp benchmark searches with (default 0, every core)")
+    args = parser.parse_args(argv)
+    results = []
+    for name in args.benchmark or list(BENCHMARKS):
+        if name == "memory":
+            results.append(memoryBenchmark(args.games, args.plies, args.seed))
+        elif name == "makeunmake":
+            results.append(makeUnmakeBenchmark(args.rounds))
+        elif name == "fen":
+            results.append(fenBenchmark(seed=args.seed))
+        elif name == "smp":
+            results.append(smpBenchmark(args.depth, args.workers))
+        elif name == "pruning":
+            results.append(pruningBenchmark(args.depth))
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
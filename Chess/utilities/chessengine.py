@@ -2,16 +2,298 @@
 This class is responsible for storing all the information about the current state of a chess game.
 It will also be responsible for determining the valid moves at the current state.It will also keep the move log
 """
+import random
+from array import array
 
+#The position is stored as bitboards: one 64-bit integer per piece type and color.
+#Squares are numbered row*8 + col, so square 0 is a8 (top left of the board) and square 63 is h1.
+#Bit n of a bitboard is set when square n holds that piece.
+PIECES = ("wp","wN","wB","wR","wQ","wK","bp","bN","bB","bR","bQ","bK")
+SQUARE_COORDS = tuple((sq // 8, sq % 8) for sq in range(64)) #(row, col) of every square
+
+#The move generators, makeMove and the search work with moves packed into 16-bit ints:
+#bits 0-5 start square, 6-11 end square, 12-13 flags, 14-15 the piece a pawn promotes to.
+#Move objects are only built for the UI (GameState.getValidMoves, GameState.moveFromCode)
+MOVE_ENPASSANT = 1 << 12
+MOVE_PROMOTION = 2 << 12
+MOVE_FLAGS = 0xF000 #flag and promotion bits, 0 for a plain move or capture
+PROMOTION_PIECES = "NBRQ" #piece type by the value of bits 14-15
+PROMOTE_QUEEN = MOVE_PROMOTION | 3 << 14
+
+ROOK_DIRECTIONS = ((-1,0),(0,-1),(1,0),(0,1))
+BISHOP_DIRECTIONS = ((-1,-1),(-1,1),(1,-1),(1,1))
+KNIGHT_OFFSETS = ((-2,-1),(-2,1),(-1,-2),(-1,2),(1,-2),(1,2),(2,-1),(2,1))
+KING_OFFSETS = ((-1,-1),(-1,0),(-1,1),(0,-1),(0,1),(1,-1),(1,0),(1,1))
+
+
+#bitboard of the squares reached from sq by each (row, col) offset that stays on the board
+def offsetAttacks(sq, offsets):
+    r, c = SQUARE_COORDS[sq]
+    attacks = 0
+    for dr, dc in offsets:
+        if 0 <= r + dr < 8 and 0 <= c + dc < 8:
+            attacks |= 1 << ((r + dr)*8 + c + dc)
+    return attacks
+
+#the squares from sq to the edge of the board in one direction, nearest first
+def raySquares(sq, d):
+    r, c = SQUARE_COORDS[sq]
+    squares = []
+    for i in range(1, 8):
+        endRow = r + d[0]*i
+        endCol = c + d[1]*i
+        if not (0 <= endRow < 8 and 0 <= endCol < 8):
+            break
+        squares.append(endRow*8 + endCol)
+    return squares
+
+#precomputed attack tables, built once at import
+KNIGHT_ATTACKS = tuple(offsetAttacks(sq, KNIGHT_OFFSETS) for sq in range(64))
+KING_ATTACKS = tuple(offsetAttacks(sq, KING_OFFSETS) for sq in range(64))
+PAWN_ATTACKS = { #squares a pawn of that color on sq attacks
+    "w": tuple(offsetAttacks(sq, ((-1,-1),(-1,1))) for sq in range(64)),
+    "b": tuple(offsetAttacks(sq, ((1,-1),(1,1))) for sq in range(64)),
+}
+FILE_A = 0x0101010101010101 #bitboard of column 0
+FILE_H = FILE_A << 7 #bitboard of column 7
+FULL_BOARD = (1 << 64) - 1
+#RAYS[sq][d] is a bitboard of every square from sq to the edge of the board in direction d
+RAYS = tuple({d: sum(1 << s for s in raySquares(sq, d)) for d in ROOK_DIRECTIONS + BISHOP_DIRECTIONS}
+             for sq in range(64))
+
+#For two squares on the same row, column or diagonal, BETWEEN[a][b] is a bitboard of the squares strictly
+#between them and LINE[a][b] of the whole line through both, edge to edge. Both are 0 for squares not in line
+def lineTables():
+    between = [[0] * 64 for sq in range(64)]
+    line = [[0] * 64 for sq in range(64)]
+    for a in range(64):
+        for d in ROOK_DIRECTIONS + BISHOP_DIRECTIONS:
+            full = RAYS[a][d] | RAYS[a][(-d[0], -d[1])] | 1 << a
+            for b in raySquares(a, d):
+                between[a][b] = RAYS[a][d] & ~RAYS[b][d] & ~(1 << b)
+                line[a][b] = full
+    return tuple(map(tuple, between)), tuple(map(tuple, line))
+
+BETWEEN, LINE = lineTables()
+
+#Sliding piece lookups: the blockers that matter for a rook or bishop on sq are the squares on its rays,
+#excluding the last square of each ray. SLIDER_ATTACKS[sq] maps every subset of those blockers
+#(occupied & MASK[sq]) to the attacked squares, so a slider's moves are a single dict lookup.
+def slidingTables(directions):
+    masks = []
+    tables = []
+    for sq in range(64):
+        rays = [[1 << s for s in raySquares(sq, d)] for d in directions]
+        mask = 0
+        for ray in rays:
+            for bit in ray[:-1]:
+                mask |= bit
+        table = {}
+        blockers = 0
+        while True: #visit every subset of the mask (carry-rippler)
+            attacks = 0
+            for ray in rays:
+                for bit in ray:
+                    attacks |= bit
+                    if blockers & bit:
+                        break
+            table[blockers] = attacks
+            blockers = (blockers - mask) & mask
+            if blockers == 0:
+                break
+        masks.append(mask)
+        tables.append(table)
+    return tuple(masks), tuple(tables)
+
+ROOK_MASKS, ROOK_ATTACKS = slidingTables(ROOK_DIRECTIONS)
+BISHOP_MASKS, BISHOP_ATTACKS = slidingTables(BISHOP_DIRECTIONS)
+
+#piece values for static exchange evaluation, the king is worth more than anything it could win
+SEE_VALUES = {"p": 100, "N": 320, "B": 330, "R": 500, "Q": 900, "K": 20000, "-": 0}
+
+#Evaluation tables: material plus a bonus for the square a piece stands on, one table for the middlegame and one
+#for the endgame. The tables are from white's side with a8 first, black uses the mirrored square.
+#GameState keeps the sum over the pieces in pieceSquareScore as moves are made, utilities.evaluation blends the
+#middlegame and endgame parts by the game phase
+MATERIAL_VALUES = {"p": 100, "N": 320, "B": 330, "R": 500, "Q": 900, "K": 0}
+PST_MIDGAME = {
+    "p": (0, 0, 0, 0, 0, 0, 0, 0,
+          50, 50, 50, 50, 50, 50, 50, 50,
+          10, 10, 20, 30, 30, 20, 10, 10,
+          5, 5, 10, 25, 25, 10, 5, 5,
+          0, 0, 0, 20, 20, 0, 0, 0,
+          5, -5, -10, 0, 0, -10, -5, 5,
+          5, 10, 10, -20, -20, 10, 10, 5,
+          0, 0, 0, 0, 0, 0, 0, 0),
+    "N": (-50, -40, -30, -30, -30, -30, -40, -50,
+          -40, -20, 0, 0, 0, 0, -20, -40,
+          -30, 0, 10, 15, 15, 10, 0, -30,
+          -30, 5, 15, 20, 20, 15, 5, -30,
+          -30, 0, 15, 20, 20, 15, 0, -30,
+          -30, 5, 10, 15, 15, 10, 5, -30,
+          -40, -20, 0, 5, 5, 0, -20, -40,
+          -50, -40, -30, -30, -30, -30, -40, -50),
+    "B": (-20, -10, -10, -10, -10, -10, -10, -20,
+          -10, 0, 0, 0, 0, 0, 0, -10,
+          -10, 0, 5, 10, 10, 5, 0, -10,
+          -10, 5, 5, 10, 10, 5, 5, -10,
+          -10, 0, 10, 10, 10, 10, 0, -10,
+          -10, 10, 10, 10, 10, 10, 10, -10,
+          -10, 5, 0, 0, 0, 0, 5, -10,
+          -20, -10, -10, -10, -10, -10, -10, -20),
+    "R": (0, 0, 0, 0, 0, 0, 0, 0,
+          5, 10, 10, 10, 10, 10, 10, 5,
+          -5, 0, 0, 0, 0, 0, 0, -5,
+          -5, 0, 0, 0, 0, 0, 0, -5,
+          -5, 0, 0, 0, 0, 0, 0, -5,
+          -5, 0, 0, 0, 0, 0, 0, -5,
+          -5, 0, 0, 0, 0, 0, 0, -5,
+          0, 0, 0, 5, 5, 0, 0, 0),
+    "Q": (-20, -10, -10, -5, -5, -10, -10, -20,
+          -10, 0, 0, 0, 0, 0, 0, -10,
+          -10, 0, 5, 5, 5, 5, 0, -10,
+          -5, 0, 5, 5, 5, 5, 0, -5,
+          0, 0, 5, 5, 5, 5, 0, -5,
+          -10, 5, 5, 5, 5, 5, 0, -10,
+          -10, 0, 5, 0, 0, 0, 0, -10,
+          -20, -10, -10, -5, -5, -10, -10, -20),
+    "K": (-30, -40, -40, -50, -50, -40, -40, -30,
+          -30, -40, -40, -50, -50, -40, -40, -30,
+          -30, -40, -40, -50, -50, -40, -40, -30,
+          -30, -40, -40, -50, -50, -40, -40, -30,
+          -20, -30, -30, -40, -40, -30, -30, -20,
+          -10, -20, -20, -20, -20, -20, -20, -10,
+          20, 20, 0, 0, 0, 0, 20, 20,
+          20, 30, 10, 0, 0, 10, 30, 20),
+}
+#in the endgame pawns are worth more the closer they are to promoting and the king belongs in the centre
+PST_ENDGAME = dict(PST_MIDGAME, **{
+    "p": (0,) * 8 + (80,) * 8 + (50,) * 8 + (30,) * 8 + (20,) * 8 + (10,) * 8 + (10,) * 8 + (0,) * 8,
+    "K": (-50, -40, -30, -20, -20, -30, -40, -50,
+          -30, -20, -10, 0, 0, -10, -20, -30,
+          -30, -10, 20, 30, 30, 20, -10, -30,
+          -30, -10, 30, 40, 40, 30, -10, -30,
+          -30, -10, 30, 40, 40, 30, -10, -30,
+          -30, -10, 20, 30, 30, 20, -10, -30,
+          -30, -30, 0, 0, 0, 0, -30, -30,
+          -50, -30, -30, -30, -30, -30, -30, -50),
+})
+
+#a middlegame and an endgame score packed into one int, so a move updates both with one addition.
+#Sums of packed scores unpack to the sums of their parts
+def packScore(midgame, endgame):
+    return midgame + (endgame << 32)
+
+def unpackScore(score):
+    midgame = ((score + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+    return midgame, (score - midgame) >> 32
+
+#packed score of every piece on every square from white's side: positive for white pieces, negative for black
+def pieceSquareScores():
+    scores = {}
+    for piece in PIECES:
+        kind = piece[1]
+        mirror = 0 if piece[0] == "w" else 56
+        sign = 1 if piece[0] == "w" else -1
+        scores[piece] = tuple(sign * packScore(MATERIAL_VALUES[kind] + PST_MIDGAME[kind][sq ^ mirror],
+                                               MATERIAL_VALUES[kind] + PST_ENDGAME[kind][sq ^ mirror])
+                              for sq in range(64))
+    return scores
+
+PIECE_SQUARE_SCORES = pieceSquareScores()
+#game phase: the pieces left weighted by value, PHASE_TOTAL with every piece on the board and 0 with only
+#kings and pawns
+PHASE_WEIGHTS = {piece: {"p": 0, "N": 1, "B": 1, "R": 2, "Q": 4, "K": 0}[piece[1]] for piece in PIECES}
+PHASE_TOTAL = 24
+
+#Zobrist keys: a random 64-bit number for every piece on every square, for black to move and for each
+#en passant file. The position key is the XOR of the numbers that apply, so a move only flips a few of them.
+#The seed is fixed so every process (and every run) gets the same keys.
+zobristRandom = random.Random(20221)
+ZOBRIST_PIECES = {piece: tuple(zobristRandom.getrandbits(64) for sq in range(64)) for piece in PIECES}
+ZOBRIST_BLACK_TO_MOVE = zobristRandom.getrandbits(64)
+ZOBRIST_ENPASSANT = tuple(zobristRandom.getrandbits(64) for col in range(8))
+#the pawn key (GameState.pawnKey) only hashes the pawns, it keys the pawn structure evaluation.
+#Other pieces get zeros so makeMove can XOR in whatever moved or was captured
+ZOBRIST_PAWNS = {piece: ZOBRIST_PIECES[piece] if piece[1] == "p" else (0,) * 64 for piece in PIECES}
+
+#castling rights are 4 bits, the engine doesn't castle yet but keeps track of them for FEN and the position key
+CASTLE_WHITE_KINGSIDE = 1
+CASTLE_WHITE_QUEENSIDE = 2
+CASTLE_BLACK_KINGSIDE = 4
+CASTLE_BLACK_QUEENSIDE = 8
+CASTLING_FEN = "KQkq" #FEN letter of each right, in bit order
+#rights left after a move from or to each square: moving the king or a rook, or capturing a rook, loses them
+CASTLING_MASK = tuple(15 & ~{60: CASTLE_WHITE_KINGSIDE | CASTLE_WHITE_QUEENSIDE, 63: CASTLE_WHITE_KINGSIDE,
+                             56: CASTLE_WHITE_QUEENSIDE, 4: CASTLE_BLACK_KINGSIDE | CASTLE_BLACK_QUEENSIDE,
+                             7: CASTLE_BLACK_KINGSIDE, 0: CASTLE_BLACK_QUEENSIDE}.get(sq, 0) for sq in range(64))
+zobristCastlingRights = tuple(zobristRandom.getrandbits(64) for right in range(4))
+ZOBRIST_CASTLING = tuple(  #key of every combination of rights, 0 for none
+    zobristCastlingRights[0] * (rights & 1) ^ zobristCastlingRights[1] * (rights >> 1 & 1) ^
+    zobristCastlingRights[2] * (rights >> 2 & 1) ^ zobristCastlingRights[3] * (rights >> 3 & 1) for rights in range(16))
+
+FEN_PIECES = {"P": "wp", "N": "wN", "B": "wB", "R": "wR", "Q": "wQ", "K": "wK",
+              "p": "bp", "n": "bN", "b": "bB", "r": "bR", "q": "bQ", "k": "bK"}
+PIECE_FEN = {piece: letter for letter, piece in FEN_PIECES.items()}
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+#Rows parsed by GameState.from_fen, keyed by (row number, FEN text of the row). The same rows come up again and
+#again in a batch of positions (pawn chains, back ranks, empty rows), so most rows are a dict lookup
+FEN_ROWS = {}
+FEN_ROWS_LIMIT = 100000 #the cache is emptied when it gets this big
+
+#parses row r of a FEN placement into (the 8 squares as a tuple, ((piece, bitboard), ...), white pieces bitboard,
+#black pieces bitboard, Zobrist key of the pieces, packed piece-square score, phase, pawn key) and caches it.
+#fen is only used in error messages
+def parseFenRow(r, text, fen):
+    squares = []
+    pieceBits = {}
+    white = black = key = score = phase = pawnKey = 0
+    sq = r*8
+    for letter in text:
+        piece = FEN_PIECES.get(letter)
+        if piece is None:
+            if not "1" <= letter <= "8":
+                raise ValueError("invalid FEN, unknown piece %r: %r" % (letter, fen))
+            squares += ["--"] * (ord(letter) - 48)
+            sq += ord(letter) - 48
+            continue
+        squares.append(piece)
+        if len(squares) > 8:
+            break
+        pieceBits[piece] = pieceBits.get(piece, 0) | 1 << sq
+        if letter < "a":
+            white |= 1 << sq
+        else:
+            black |= 1 << sq
+        key ^= ZOBRIST_PIECES[piece][sq]
+        score += PIECE_SQUARE_SCORES[piece][sq]
+        phase += PHASE_WEIGHTS[piece]
+        pawnKey ^= ZOBRIST_PAWNS[piece][sq]
+        sq += 1
+    if len(squares) != 8:
+        raise ValueError("invalid FEN, row %d isn't 8 squares: %r" % (r + 1, fen))
+    if (r == 0 or r == 7) and ("wp" in pieceBits or "bp" in pieceBits):
+        raise ValueError("invalid FEN, pawns can't stand on the first or last rank: %r" % fen)
+    if len(FEN_ROWS) >= FEN_ROWS_LIMIT:
+        FEN_ROWS.clear()
+    row = FEN_ROWS[(r, text)] = (tuple(squares), tuple(pieceBits.items()), white, black, key, score, phase,
+                                  pawnKey)
+    return row
 
 
 class GameState():
-    def __init__(self):
+    #board, whiteTomove and enpassantPossible set up a custom position (used by the perft positions),
+    #by default a new game starts. castlingRights None gives every right the king and rooks are still placed for.
+    #GameState.from_fen sets up a position from FEN
+    def __init__(self, board=None, whiteTomove=True, enpassantPossible=(), castlingRights=None, halfmoveClock=0,
+                 fullmoveNumber=1):
         #this board is a 8*8 2D list, each element of the list has 2 characters.
         #The first character represents the color of the piece "b"or"w".
         #The second character represents the type of the piece, "K","Q","B","R","N",or "p".
         # "--" represents the empty space in the board.
-        self.board = [
+        if board is None:
+            board = [
             ["bR","bN","bB","bQ","bK","bB","bN","bR"],
             ["bp","bp","bp","bp","bp","bp","bp","bp"],
             ["--","--","--","--","--","--","--","--"],
@@ -20,107 +302,689 @@ class GameState():
             ["--","--","--","--","--","--","--","--"],
             ["wp","wp","wp","wp","wp","wp","wp","wp"],
             ["wR","wN","wB","wQ","wK","wB","wN","wR"],
-        ]
-        self.moveFunctions = {"p": self.getPawnMoves,"R":self.getRookMoves,"N":self.getKnightMoves,
-        "B":self.getBishopMoves,"Q":self.getQueenMoves, "K": self.getKingMoves}
-        self.whiteTomove = True
-        self.movelog = []
-        self.whiteKingLocation = (7, 4)
-        self.blackKingLocation = (0, 4)
+            ]
+        self.loadBoard(board)
+        if castlingRights is None:
+            castlingRights = self.castlingRightsFromBoard()
+        self.initState(whiteTomove, enpassantPossible, castlingRights, halfmoveClock, fullmoveNumber)
+
+    #everything but the pieces, for a position nothing has been played from yet.
+    #pieceKey is the Zobrist key of the pieces alone, scores (pieceSquareScore, phase) and pawnKey when they are
+    #already known
+    def initState(self, whiteTomove, enpassantPossible, castlingRights, halfmoveClock, fullmoveNumber, pieceKey=None,
+                  scores=None, pawnKey=None):
+        self.whiteTomove = whiteTomove
+        self.movelog = [] #packed move codes, GameState.lastMove() gives the last one as a Move
+        #one record per move in the move log with what undoMove can't work out from the move itself:
+        #(piece captured or "--", enpassantPossible, castlingRights, halfmoveClock, zobristKey, pieceSquareScore, phase,
+        #pawnKey) from before the move
+        self.undoStack = []
+        self.nullMoves = [] #(enpassantPossible, zobristKey) from before each null move not taken back yet
         self.checkMate = False
         self.staleMate = False
-        self.enpassantPossible = () #co ordinates for the square where en passant capture is possible
-       
-    #takes a move as a parameter and execute it(This will not work for castling, pawn promition,and en-passant)
+        self.enpassantPossible = tuple(enpassantPossible) #co ordinates for the square where en passant capture is possible
+        self.castlingRights = castlingRights #CASTLE_* bits
+        self.halfmoveClock = halfmoveClock #moves since the last capture or pawn move, for the 50 move rule
+        self.fullmoveNumber = fullmoveNumber #starts at 1 and goes up after every black move
+        self.zobristKey = self.computeZobrist(pieceKey) #64-bit hash of the position, updated by makeMove
+        #packed material + piece-square score from white's side and game phase, updated by makeMove
+        self.pieceSquareScore, self.phase = scores if scores is not None else self.computePieceSquareScore()
+        self.pawnKey = pawnKey if pawnKey is not None else self.computePawnKey() #Zobrist key of the pawns alone
+        self.pins = {} #square of each pinned piece -> bitboard of the line it may move along, set by getValidMoves
+
+    #sets up the bitboards from a 8*8 list of pieces
+    def loadBoard(self, board):
+        self.squares = ["--"] * 64 #the piece on each square, indexed row*8 + col
+        self.bitboards = dict.fromkeys(PIECES, 0) #one 64-bit integer per piece type and color
+        self.colorBitboards = {"w": 0, "b": 0} #all the squares occupied by each side
+        for r in range(8):
+            for c in range(8):
+                piece = board[r][c]
+                if piece != "--":
+                    sq = r*8 + c
+                    self.squares[sq] = piece
+                    self.bitboards[piece] |= 1 << sq
+                    self.colorBitboards[piece[0]] |= 1 << sq
+        self.indexBoard()
+
+    #the occupancy, read-only rows and king locations once squares and the bitboards are set
+    def indexBoard(self):
+        self.occupied = self.colorBitboards["w"] | self.colorBitboards["b"] #all the occupied squares
+        squares = self.squares
+        self._rows = [tuple(squares[0:8]), tuple(squares[8:16]), tuple(squares[16:24]), tuple(squares[24:32]),
+                     tuple(squares[32:40]), tuple(squares[40:48]), tuple(squares[48:56]), tuple(squares[56:64])] #read-only copy of each row of squares
+        self.whiteKingLocation = SQUARE_COORDS[self.bitboards["wK"].bit_length() - 1]
+        self.blackKingLocation = SQUARE_COORDS[self.bitboards["bK"].bit_length() - 1]
+
+    #the castling rights a position can still have: those whose king and rook are on their starting squares
+    def castlingRightsFromBoard(self):
+        squares = self.squares
+        rights = 0
+        if squares[60] == "wK":
+            rights |= (squares[63] == "wR") * CASTLE_WHITE_KINGSIDE | (squares[56] == "wR") * CASTLE_WHITE_QUEENSIDE
+        if squares[4] == "bK":
+            rights |= (squares[7] == "bR") * CASTLE_BLACK_KINGSIDE | (squares[0] == "bR") * CASTLE_BLACK_QUEENSIDE
+        return rights
+
+    #compact picklable copy of the position (pieces, side to move, en passant square, castling rights and clocks),
+    #without the move log
+    def serialize(self):
+        return ("".join(self.squares), self.whiteTomove, self.enpassantPossible, self.castlingRights,
+                self.halfmoveClock, self.fullmoveNumber)
+
+    #builds a GameState from the output of serialize
+    @classmethod
+    def deserialize(cls, data):
+        pieces = data[0]
+        board = [[pieces[(r*8 + c)*2:(r*8 + c)*2 + 2] for c in range(8)] for r in range(8)]
+        return cls(board, *data[1:])
+
+    #builds a GameState from a FEN string. The clocks may be left out. Raises ValueError for a malformed FEN
+    @classmethod
+    def from_fen(cls, fen):
+        placement, space, fields = fen.partition(" ")
+        rowTexts = placement.split("/")
+        if len(rowTexts) != 8:
+            raise ValueError("invalid FEN, the board must have 8 rows: %r" % fen)
+        squares = []
+        rows = []
+        bitboards = dict.fromkeys(PIECES, 0)
+        white = black = key = score = phase = pawnKey = 0
+        for r, text in enumerate(rowTexts):
+            rowSquares, pieceBits, rowWhite, rowBlack, rowKey, rowScore, rowPhase, rowPawnKey = \
+                FEN_ROWS.get((r, text)) or parseFenRow(r, text, fen)
+            squares += rowSquares
+            rows.append(rowSquares)
+            for piece, bits in pieceBits:
+                bitboards[piece] |= bits
+            white |= rowWhite
+            black |= rowBlack
+            key ^= rowKey
+            score += rowScore
+            phase += rowPhase
+            pawnKey ^= rowPawnKey
+        for king in ("wK", "bK"):
+            if not bitboards[king] or bitboards[king] & (bitboards[king] - 1):
+                raise ValueError("invalid FEN, each side needs exactly one king: %r" % fen)
+        gs = cls.__new__(cls)
+        gs.squares = squares
+        gs.bitboards = bitboards
+        gs.colorBitboards = {"w": white, "b": black}
+        gs.occupied = white | black
+        gs._rows = rows
+        gs.whiteKingLocation = SQUARE_COORDS[bitboards["wK"].bit_length() - 1]
+        gs.blackKingLocation = SQUARE_COORDS[bitboards["bK"].bit_length() - 1]
+
+        fields = fields.split()
+        if not fields or fields[0] not in ("w", "b"):
+            raise ValueError("invalid FEN, side to move must be w or b: %r" % fen)
+        whiteTomove = fields[0] == "w"
+        castlingRights = 0
+        if len(fields) > 1 and fields[1] != "-":
+            for letter in fields[1]:
+                right = CASTLING_FEN.find(letter)
+                if right < 0:
+                    raise ValueError("invalid FEN, unknown castling right %r: %r" % (letter, fen))
+                castlingRights |= 1 << right
+            #a right is lost once its king or rook has left its square, so equal positions get equal keys
+            castlingRights &= gs.castlingRightsFromBoard()
+        enpassantPossible = ()
+        if len(fields) > 2 and fields[2] != "-":
+            square = fields[2]
+            #the square a pawn skipped over, on rank 6 when white is to move and rank 3 when black is
+            if len(square) != 2 or not "a" <= square[0] <= "h" or square[1] != ("6" if whiteTomove else "3"):
+                raise ValueError("invalid FEN, bad en passant square %r for the side to move: %r" % (square, fen))
+            enpassantPossible = (RANKS_TO_ROWS[square[1]], FILES_TO_COLS[square[0]])
+            sq = enpassantPossible[0]*8 + enpassantPossible[1]
+            captureSq = sq + 8 if whiteTomove else sq - 8
+            if squares[sq] != "--" or squares[captureSq] != ("bp" if whiteTomove else "wp"):
+                raise ValueError("invalid FEN, there is no pawn to take en passant on %r: %r" % (square, fen))
+        try:
+            halfmoveClock = int(fields[3]) if len(fields) > 3 else 0
+            fullmoveNumber = int(fields[4]) if len(fields) > 4 else 1
+        except ValueError:
+            raise ValueError("invalid FEN, the clocks must be numbers: %r" % fen) from None
+        gs.initState(whiteTomove, enpassantPossible, castlingRights, halfmoveClock, fullmoveNumber, key,
+                     (score, phase), pawnKey)
+        return gs
+
+    #the position as a FEN string
+    def to_fen(self):
+        placement = []
+        for row in self._rows:
+            empty = 0
+            for piece in row:
+                if piece == "--":
+                    empty += 1
+                else:
+                    if empty:
+                        placement.append(str(empty))
+                        empty = 0
+                    placement.append(PIECE_FEN[piece])
+            if empty:
+                placement.append(str(empty))
+            placement.append("/")
+        placement[-1] = " w " if self.whiteTomove else " b "
+        rights = self.castlingRights
+        castling = "".join(CASTLING_FEN[i] for i in range(4) if rights >> i & 1) or "-"
+        if self.enpassantPossible != ():
+            enpassant = COLS_TO_FILES[self.enpassantPossible[1]] + ROWS_TO_RANKS[self.enpassantPossible[0]]
+        else:
+            enpassant = "-"
+        return "".join(placement) + castling + " " + enpassant + " " + str(self.halfmoveClock) + " " + str(self.fullmoveNumber)
+
+    #the Zobrist key of the position worked out from scratch, makeMove keeps self.zobristKey up to date instead.
+    #pieceKey is the part for the pieces if it is known already
+    def computeZobrist(self, pieceKey=None):
+        key = pieceKey
+        if key is None:
+            key = 0
+            for sq in range(64):
+                if self.squares[sq] != "--":
+                    key ^= ZOBRIST_PIECES[self.squares[sq]][sq]
+        if not self.whiteTomove:
+            key ^= ZOBRIST_BLACK_TO_MOVE
+        if self.enpassantPossible != ():
+            key ^= ZOBRIST_ENPASSANT[self.enpassantPossible[1]]
+        return key ^ ZOBRIST_CASTLING[self.castlingRights]
+
+    #(pieceSquareScore, phase) worked out from scratch, makeMove keeps them up to date instead
+    def computePieceSquareScore(self):
+        score = phase = 0
+        for sq in range(64):
+            piece = self.squares[sq]
+            if piece != "--":
+                score += PIECE_SQUARE_SCORES[piece][sq]
+                phase += PHASE_WEIGHTS[piece]
+        return score, phase
+
+    #the pawn key worked out from scratch, makeMove keeps self.pawnKey up to date instead
+    def computePawnKey(self):
+        key = 0
+        for sq in range(64):
+            if self.squares[sq][1] == "p":
+                key ^= ZOBRIST_PAWNS[self.squares[sq]][sq]
+        return key
+
+    #64-bit Zobrist key of the current position, equal positions (pieces, side to move, en passant,
+    #castling rights) get equal keys
+    def zobrist(self):
+        return self.zobristKey
+
+    #positions can key dicts and sets. The hash changes as moves are made, so use zobrist() or serialize()
+    #as the key to remember a position the GameState will move on from
+    def __hash__(self):
+        return self.zobristKey
+
+    def __eq__(self, other):
+        if isinstance(other, GameState):
+            return self.zobristKey == other.zobristKey and self.squares == other.squares and \
+                self.whiteTomove == other.whiteTomove and self.enpassantPossible == other.enpassantPossible and \
+                self.castlingRights == other.castlingRights
+        return NotImplemented
+
+    #read-only 8*8 snapshot of the board, board[r][c] is the piece on row r, column c ("--" if empty).
+    #It is a tuple of row tuples, so it doesn't follow later moves and can't be changed. The position is changed
+    #only through makeMove and undoMove
+    @property
+    def board(self):
+        return tuple(self._rows)
+
+    #refreshes the read-only rows touched by a move from square start to square end
+    def updateRows(self, start, end):
+        startRow = start >> 3
+        endRow = end >> 3
+        self._rows[startRow] = tuple(self.squares[startRow*8:startRow*8 + 8])
+        if endRow != startRow:
+            self._rows[endRow] = tuple(self.squares[endRow*8:endRow*8 + 8])
+
+    #the Move for a packed move code that can be played in this position
+    def moveFromCode(self, code):
+        start = code & 63
+        end = (code >> 6) & 63
+        pieceMoved = self.squares[start]
+        if code & MOVE_ENPASSANT:
+            pieceCaptured = "bp" if pieceMoved[0] == "w" else "wp"
+        else:
+            pieceCaptured = self.squares[end]
+        return Move.fromCode(code, pieceMoved, pieceCaptured)
+
+    #the last move made as a Move (None if no move has been made)
+    def lastMove(self):
+        if not self.movelog:
+            return None
+        code = self.movelog[-1]
+        pieceMoved = self.squares[(code >> 6) & 63]
+        if code & MOVE_PROMOTION:
+            pieceMoved = pieceMoved[0] + "p"
+        return Move.fromCode(code, pieceMoved, self.undoStack[-1][0])
+
+    #takes a move (a Move or a packed move code) as a parameter and execute it(This will not work for castling)
     def makeMove(self, move):
-        self.board[move.startRow][move.startCol] = "--"
-        self.board[move.endRow][move.endCol] = move.pieceMoved
+        if not isinstance(move, int):
+            move = move.code
+        start = move & 63
+        end = (move >> 6) & 63
+        startBit = 1 << start
+        endBit = 1 << end
+        squares = self.squares
+        bitboards = self.bitboards
+        colorBitboards = self.colorBitboards
+        piece = squares[start]
+        color = piece[0]
+        enemyColor = "b" if color == "w" else "w"
+        key = self.zobristKey ^ ZOBRIST_BLACK_TO_MOVE ^ ZOBRIST_PIECES[piece][start]
+        score = self.pieceSquareScore - PIECE_SQUARE_SCORES[piece][start]
+        phase = self.phase
+        pawnKey = self.pawnKey ^ ZOBRIST_PAWNS[piece][start]
+        squares[start] = "--"
+        bitboards[piece] ^= startBit
+        #enpassant Move
+        if move & MOVE_ENPASSANT:
+            captureSq = (start & ~7) | (end & 7) #the captured pawn is beside the landing square
+            captured = squares[captureSq]
+            squares[captureSq] = "--" #capturing the pawn
+            bitboards[captured] ^= 1 << captureSq
+            colorBitboards[enemyColor] ^= 1 << captureSq
+            key ^= ZOBRIST_PIECES[captured][captureSq]
+            score -= PIECE_SQUARE_SCORES[captured][captureSq]
+            pawnKey ^= ZOBRIST_PAWNS[captured][captureSq]
+        else:
+            captured = squares[end]
+            if captured != "--":
+                bitboards[captured] ^= endBit
+                colorBitboards[enemyColor] ^= endBit
+                key ^= ZOBRIST_PIECES[captured][end]
+                score -= PIECE_SQUARE_SCORES[captured][end]
+                phase -= PHASE_WEIGHTS[captured]
+                pawnKey ^= ZOBRIST_PAWNS[captured][end]
+        self.undoStack.append((captured, self.enpassantPossible, self.castlingRights, self.halfmoveClock, self.zobristKey,
+                               self.pieceSquareScore, self.phase, self.pawnKey))
+        self.halfmoveClock = 0 if piece[1] == "p" or captured != "--" else self.halfmoveClock + 1
+        if color == "b":
+            self.fullmoveNumber += 1
+        rights = self.castlingRights & CASTLING_MASK[start] & CASTLING_MASK[end]
+        if rights != self.castlingRights:
+            key ^= ZOBRIST_CASTLING[self.castlingRights] ^ ZOBRIST_CASTLING[rights]
+            self.castlingRights = rights
+        #pawnpromotion
+        if move & MOVE_PROMOTION:
+            placed = color + PROMOTION_PIECES[move >> 14]
+            phase += PHASE_WEIGHTS[placed]
+        else:
+            placed = piece
+        squares[end] = placed
+        bitboards[placed] |= endBit
+        key ^= ZOBRIST_PIECES[placed][end]
+        self.pieceSquareScore = score + PIECE_SQUARE_SCORES[placed][end]
+        self.phase = phase
+        self.pawnKey = pawnKey ^ ZOBRIST_PAWNS[placed][end] #nothing for a promoted piece
+        colorBitboards[color] ^= startBit | endBit
+        self.occupied = colorBitboards["w"] | colorBitboards["b"]
+        self.updateRows(start, end)
         self.movelog.append(move) #log the move so we can undo it later
         self.whiteTomove = not self.whiteTomove #swapplayers
         #update king's location if moved
-        if move.pieceMoved == "wK":
-            self.whiteKingLocation = (move.endRow, move.endCol)
-        elif move.pieceMoved == "bK":
-            self.blackKingLocation = (move.endRow, move.endCol)
-        #pawnpromotion
-        if move.isPawnPromotion:
-             self.board[move.endRow][move.endCol] = move.pieceMoved[0] + "Q"
-
-        #enpassant Move
-        if move.isEnpassantMove:
-            self.board[move.startRow][move.endCol] = "--" #capturing the pawn
+        if piece == "wK":
+            self.whiteKingLocation = SQUARE_COORDS[end]
+        elif piece == "bK":
+            self.blackKingLocation = SQUARE_COORDS[end]
 
         #update enpassantpossible variable
-        if move.pieceMoved[1] == "p" and abs(move.startRow - move.endRow) == 2: #only on 2 square pawn advances
-            self.enpassantPossible = ((move.startRow + move.endRow)//2,move.startCol)
+        if self.enpassantPossible != ():
+            key ^= ZOBRIST_ENPASSANT[self.enpassantPossible[1]]
+        if piece[1] == "p" and (start - end == 16 or end - start == 16): #only on 2 square pawn advances
+            self.enpassantPossible = SQUARE_COORDS[(start + end) >> 1]
+            key ^= ZOBRIST_ENPASSANT[start & 7]
         else:
             self.enpassantPossible = ()
+        self.zobristKey = key
 
 
     #Undo the last move made
     def undoMove(self):
         if len(self.movelog) != 0: #makesure there is a move to undo
             move = self.movelog.pop()
-            self.board[move.startRow][move.startCol] = move.pieceMoved
-            self.board[move.endRow][move.endCol] = move.pieceCaptured
+            #restore the state from before the move
+            captured, self.enpassantPossible, self.castlingRights, self.halfmoveClock, self.zobristKey, \
+                self.pieceSquareScore, self.phase, self.pawnKey = self.undoStack.pop()
+            start = move & 63
+            end = (move >> 6) & 63
+            startBit = 1 << start
+            endBit = 1 << end
+            squares = self.squares
+            bitboards = self.bitboards
+            colorBitboards = self.colorBitboards
+            placed = squares[end]
+            color = placed[0]
+            enemyColor = "b" if color == "w" else "w"
+            piece = color + "p" if move & MOVE_PROMOTION else placed
+            if color == "b":
+                self.fullmoveNumber -= 1
+            bitboards[placed] ^= endBit
+            squares[end] = "--"
+            squares[start] = piece
+            bitboards[piece] |= startBit
+            colorBitboards[color] ^= startBit | endBit
+            #put the captured piece back
+            if move & MOVE_ENPASSANT:
+                captureSq = (start & ~7) | (end & 7)
+                squares[captureSq] = captured
+                bitboards[captured] |= 1 << captureSq
+                colorBitboards[enemyColor] |= 1 << captureSq
+            elif captured != "--":
+                squares[end] = captured
+                bitboards[captured] |= endBit
+                colorBitboards[enemyColor] |= endBit
+            self.occupied = colorBitboards["w"] | colorBitboards["b"]
+            self.updateRows(start, end)
             self.whiteTomove  = not self.whiteTomove #switch turns back
             #update the king's position if needed
-            if move.pieceMoved == "wK":
-                self.whiteKingLocation = (move.startRow, move.startCol)
-            elif move.pieceMoved == "bK":
-                self.blackKingLocation = (move.startRow, move.startCol)
-            #undo enpassant 
-            if move.isEnpassantMove:
-                self.board[move.endRow][move.endCol] = "--" #leave landing square blank
-                self.board[move.startRow][move.endCol] == move.pieceCaptured
-                self.enpassantPossible = (move.endRow, move.endCol)
-            #undo 2square pawn advance
-            if move.pieceMoved[1] == "p" and abs(move.startRow - move.endRow) == 2:
-                self.enpassantPossible = ()
-            
-
-    #All moves considering checks
-    def getValidMoves(self):
+            if piece == "wK":
+                self.whiteKingLocation = SQUARE_COORDS[start]
+            elif piece == "bK":
+                self.blackKingLocation = SQUARE_COORDS[start]
+
+    #passes the turn to the other side without moving a piece, for null move pruning in the search.
+    #It isn't logged in the movelog, must not be made when the side to move is in check and is taken back with
+    #undoNullMove before any other move is undone
+    def makeNullMove(self):
+        self.nullMoves.append((self.enpassantPossible, self.zobristKey))
+        key = self.zobristKey ^ ZOBRIST_BLACK_TO_MOVE
+        if self.enpassantPossible != ():
+            key ^= ZOBRIST_ENPASSANT[self.enpassantPossible[1]]
+            self.enpassantPossible = ()
+        self.zobristKey = key
+        self.whiteTomove = not self.whiteTomove
+
+    def undoNullMove(self):
+        self.enpassantPossible, self.zobristKey = self.nullMoves.pop()
+        self.whiteTomove = not self.whiteTomove
+
+
+    #All moves considering checks as a MoveList of Move objects, for the UI. capturesOnly gives only captures
+    #and promotions, quietsOnly everything else
+    def getValidMoves(self, capturesOnly=False, quietsOnly=False):
+        return MoveList([self.moveFromCode(code) for code in self.getValidMoveCodes(capturesOnly, quietsOnly)])
+
+    #All moves considering checks as packed move codes, see getValidMoves
+    def getValidMoveCodes(self, capturesOnly=False, quietsOnly=False):
         tempEnpassandPossible = self.enpassantPossible
         moves = []
-        self.inCheck, self.pins, self.checks = self.checkForPinsAndChecks()
+        self.checkers, self.pins = self.pinsAndCheckers()
+        self.inCheck = self.checkers != 0
+        self.setTargetMask(capturesOnly, quietsOnly)
         if self.whiteTomove:
             KingRow = self.whiteKingLocation[0]
             kingCol = self.whiteKingLocation[1]
         else:
             KingRow = self.blackKingLocation[0]
             kingCol = self.blackKingLocation[1]
+        kingSq = KingRow*8 + kingCol
         if self.inCheck:
-            if len(self.checks) == 1: #only one check, block check or move king
-                moves = self.getAllPossibleMoves()
-                #to block a check u must move a piece into one of the squares b/w the enemy piece and king
-                check = self.checks[0] #check information
-                checkRow = check[0]
-                checkCol = check[1]
-                pieceChecking = self.board[checkRow][checkCol] #enemy piece causing the check
-                validSquares = [] #squares that pieces can move to
-                #if Knight, must capture knight or move King, other pieces can be blocked
-                if pieceChecking[1] == "N":
-                    validSquares = [(checkRow, checkCol)]
-                else:
-                    for i in range(1,8):
-                        validSquare = (KingRow + check[2]*i, kingCol + check[3] *i) #check[2] & check[3] are the check directions
-                        validSquares.append(validSquare)
-                        if validSquare[0] == checkRow and validSquare[1] == checkCol: #once u get to piece and checks
-                            break
-                #get rid of any moves that don't block check or move King
-                for i in range(len(moves) -1,-1,-1): #go through backwards when u are removing from a list as iterating
-                    if moves[i].pieceMoved[1] != "K": #move doesn't move king so it must block or capture
-                        if not (moves[i].endRow,moves[i].endCol) in validSquares: #move doesn't block check or capture piece
-                            moves.remove(moves[i])
+            if not self.checkers & (self.checkers - 1): #only one check, block check or move king
+                #to block a check u must move a piece into one of the squares b/w the enemy piece and king,
+                #the only other way out is capturing it. A knight can't be blocked and BETWEEN is empty for it
+                checkSq = self.checkers.bit_length() - 1
+                moves = self.getAllPossibleMoves(capturesOnly, quietsOnly, BETWEEN[kingSq][checkSq] | 1 << checkSq)
             else: #double check, king has to move
                 self.getKingMoves(KingRow, kingCol, moves)
 
         else: #not in check so all moves are fine
-            moves = self.getAllPossibleMoves()
+            moves = self.getAllPossibleMoves(capturesOnly, quietsOnly)
         self.enpassantPossible = tempEnpassandPossible
+        if not capturesOnly and not quietsOnly:
+            self.checkMate = len(moves) == 0 and self.inCheck
+            self.staleMate = len(moves) == 0 and not self.inCheck
         
         return moves
+    #counts the leaf nodes of the legal move tree depth plies deep (used to test and time move generation)
+    def perft(self, depth):
+        if depth <= 0:
+            return 1
+        if depth == 1: #bulk counting, the moves of the last ply are never made
+            return self.countValidMoves()
+        moves = self.getValidMoveCodes()
+        nodes = 0
+        for move in moves:
+            self.makeMove(move)
+            nodes += self.perft(depth - 1)
+            self.undoMove()
+        return nodes
+
+    #the number of legal moves, the same as len(self.getValidMoveCodes()) but counted on the bitboards with the
+    #same pin and check logic without building any moves. Doesn't set checkMate and staleMate
+    def countValidMoves(self):
+        checkers, pins = self.pinsAndCheckers()
+        if self.whiteTomove:
+            color, enemyColor = "w", "b"
+            kingSq = self.whiteKingLocation[0]*8 + self.whiteKingLocation[1]
+        else:
+            color, enemyColor = "b", "w"
+            kingSq = self.blackKingLocation[0]*8 + self.blackKingLocation[1]
+        bitboards = self.bitboards
+        own = self.colorBitboards[color]
+        enemy = self.colorBitboards[enemyColor]
+        occupied = self.occupied
+        count = 0
+        kingTargets = KING_ATTACKS[kingSq] & ~own
+        if kingTargets:
+            count = bin(kingTargets & ~self.attackMap(enemyColor, occupied ^ (1 << kingSq))).count("1")
+        if checkers:
+            if checkers & (checkers - 1): #double check, only the king can move
+                return count
+            checkSq = checkers.bit_length() - 1
+            evasionMask = BETWEEN[kingSq][checkSq] | checkers
+        else:
+            evasionMask = -1
+        targetMask = ~own & evasionMask
+        pinned = 0
+        for sq in pins:
+            pinned |= 1 << sq
+
+        pieces = bitboards[color + "N"] & ~pinned #a pinned knight can never move
+        while pieces:
+            bit = pieces & -pieces
+            pieces ^= bit
+            count += bin(KNIGHT_ATTACKS[bit.bit_length() - 1] & targetMask).count("1")
+        queens = bitboards[color + "Q"]
+        pieces = bitboards[color + "R"] | queens
+        while pieces:
+            bit = pieces & -pieces
+            pieces ^= bit
+            sq = bit.bit_length() - 1
+            targets = ROOK_ATTACKS[sq][occupied & ROOK_MASKS[sq]] & targetMask
+            if bit & pinned:
+                targets &= pins[sq]
+            count += bin(targets).count("1")
+        pieces = bitboards[color + "B"] | queens
+        while pieces:
+            bit = pieces & -pieces
+            pieces ^= bit
+            sq = bit.bit_length() - 1
+            targets = BISHOP_ATTACKS[sq][occupied & BISHOP_MASKS[sq]] & targetMask
+            if bit & pinned:
+                targets &= pins[sq]
+            count += bin(targets).count("1")
+
+        #pawns that aren't pinned are counted all at once by shifting the pawn bitboard (promotions count once,
+        #pawns always promote to a queen), the pinned ones one by one
+        pawns = bitboards[color + "p"]
+        free = pawns & ~pinned
+        empty = ~occupied
+        if color == "w":
+            pushes = (free >> 8) & empty
+            doublePushes = ((pushes & 0xFF << 40) >> 8) & empty
+            captures = (((free & ~FILE_A) >> 9) & enemy, ((free & ~FILE_H) >> 7) & enemy)
+        else:
+            pushes = (free << 8) & empty & FULL_BOARD
+            doublePushes = ((pushes & 0xFF << 16) << 8) & empty
+            captures = (((free & ~FILE_A) << 7) & enemy, ((free & ~FILE_H) << 9) & enemy)
+        count += bin(pushes & evasionMask).count("1") + bin(doublePushes & evasionMask).count("1") + \
+            bin(captures[0] & evasionMask).count("1") + bin(captures[1] & evasionMask).count("1")
+        pieces = pawns & pinned
+        while pieces:
+            bit = pieces & -pieces
+            pieces ^= bit
+            sq = bit.bit_length() - 1
+            allowed = pins[sq] & evasionMask
+            forward = sq - 8 if color == "w" else sq + 8
+            if not (occupied >> forward) & 1:
+                count += (allowed >> forward) & 1
+                doubleSq = 2*forward - sq
+                if sq >> 3 == (6 if color == "w" else 1) and not (occupied >> doubleSq) & 1:
+                    count += (allowed >> doubleSq) & 1
+            count += bin(PAWN_ATTACKS[color][sq] & allowed & enemy).count("1")
+        if self.enpassantPossible != ():
+            epSq = self.enpassantPossible[0]*8 + self.enpassantPossible[1]
+            #the pawns that can take en passant are on the squares an enemy pawn on the landing square attacks
+            pieces = PAWN_ATTACKS[enemyColor][epSq] & pawns
+            while pieces:
+                bit = pieces & -pieces
+                pieces ^= bit
+                sq = bit.bit_length() - 1
+                captureSq = (sq & ~7) | (epSq & 7)
+                if evasionMask & (1 << epSq | 1 << captureSq) and not self.enpassantExposesKing(sq, epSq, captureSq):
+                    count += 1
+        return count
+
+    #perft split by root move, returns a dict of move notation -> leaf nodes below that move
+    def divide(self, depth):
+        if depth < 1:
+            raise ValueError("divide needs a depth of at least 1, got %d" % depth)
+        counts = {}
+        for move in self.getValidMoveCodes():
+            self.makeMove(move)
+            counts[moveNotation(move)] = self.perft(depth - 1)
+            self.undoMove()
+        return counts
+
+    #checks that a move worked out elsewhere (e.g. a hash or killer move from another position) is legal here
+    #without generating every move. Takes a Move or a packed move code
+    def isValidMove(self, move):
+        if not isinstance(move, int):
+            move = move.code
+        start = move & 63
+        end = (move >> 6) & 63
+        flags = move & MOVE_FLAGS
+        piece = self.squares[start]
+        color, enemyColor = ("w", "b") if self.whiteTomove else ("b", "w")
+        if piece[0] != color or (self.colorBitboards[color] >> end) & 1:
+            return False
+        type = piece[1]
+        if type == "p":
+            forward = start - 8 if color == "w" else start + 8
+            if flags == MOVE_ENPASSANT:
+                valid = self.enpassantPossible == SQUARE_COORDS[end] and (PAWN_ATTACKS[color][start] >> end) & 1
+            elif flags != (PROMOTE_QUEEN if end < 8 or end >= 56 else 0): #pawns always promote to a queen
+                valid = False
+            elif start & 7 != end & 7: #capture
+                valid = ((PAWN_ATTACKS[color][start] & self.colorBitboards[enemyColor]) >> end) & 1
+            elif end == forward:
+                valid = not (self.occupied >> end) & 1
+            else: #2 square advance from the starting row
+                valid = end == 2*forward - start and start >> 3 == (6 if color == "w" else 1) and \
+                    not (self.occupied >> forward) & 1 and not (self.occupied >> end) & 1
+        elif flags:
+            return False
+        elif type == "N":
+            valid = (KNIGHT_ATTACKS[start] >> end) & 1
+        elif type == "K":
+            valid = (KING_ATTACKS[start] >> end) & 1
+        else:
+            attacks = 0
+            if type != "B":
+                attacks |= ROOK_ATTACKS[start][self.occupied & ROOK_MASKS[start]]
+            if type != "R":
+                attacks |= BISHOP_ATTACKS[start][self.occupied & BISHOP_MASKS[start]]
+            valid = (attacks >> end) & 1
+        if not valid:
+            return False
+        #the move must not leave our own king in check
+        self.makeMove(move)
+        kingRow, kingCol = self.whiteKingLocation if color == "w" else self.blackKingLocation
+        inCheck = self.isAttacked(kingRow*8 + kingCol, enemyColor)
+        self.undoMove()
+        return not inCheck
+
+    #True if a piece of the given color attacks square sq. Looks outward from sq and stops at the first attacker,
+    #occupied (default the current board) decides what blocks the sliding pieces
+    def isAttacked(self, sq, color, occupied=None):
+        bitboards = self.bitboards
+        if KNIGHT_ATTACKS[sq] & bitboards[color + "N"]:
+            return True
+        #a pawn attacks sq from the squares a pawn of the other color on sq would attack
+        if PAWN_ATTACKS["b" if color == "w" else "w"][sq] & bitboards[color + "p"]:
+            return True
+        if KING_ATTACKS[sq] & bitboards[color + "K"]:
+            return True
+        if occupied is None:
+            occupied = self.occupied
+        queens = bitboards[color + "Q"]
+        if ROOK_ATTACKS[sq][occupied & ROOK_MASKS[sq]] & (bitboards[color + "R"] | queens):
+            return True
+        return bool(BISHOP_ATTACKS[sq][occupied & BISHOP_MASKS[sq]] & (bitboards[color + "B"] | queens))
+
+    #bitboard of the pieces of the given color ("w" or "b") attacking square (row, col), bit row*8 + col
+    #is set for a piece on (row, col)
+    def attackers(self, square, color):
+        return self.attackersTo(square[0]*8 + square[1], self.occupied) & self.colorBitboards[color]
+
+    #bitboard of the pieces of both colors that attack square sq, with occupied as the pieces on the board.
+    #Looks outward from sq: a knight on sq would reach the knights attacking it, a rook the rooks and queens, etc.
+    def attackersTo(self, sq, occupied):
+        bitboards = self.bitboards
+        return (PAWN_ATTACKS["b"][sq] & bitboards["wp"]) | (PAWN_ATTACKS["w"][sq] & bitboards["bp"]) | \
+            (KNIGHT_ATTACKS[sq] & (bitboards["wN"] | bitboards["bN"])) | \
+            (KING_ATTACKS[sq] & (bitboards["wK"] | bitboards["bK"])) | \
+            (ROOK_ATTACKS[sq][occupied & ROOK_MASKS[sq]] &
+             (bitboards["wR"] | bitboards["bR"] | bitboards["wQ"] | bitboards["bQ"])) | \
+            (BISHOP_ATTACKS[sq][occupied & BISHOP_MASKS[sq]] &
+             (bitboards["wB"] | bitboards["bB"] | bitboards["wQ"] | bitboards["bQ"]))
+
+    #static exchange evaluation: the material won (negative if lost) by the side making the capture move
+    #once both sides have recaptured on its square with their least valuable attacker for as long as it pays.
+    #Works on the bitboards without making any moves, pins are ignored. Takes a Move or a packed move code
+    def see(self, move):
+        if not isinstance(move, int):
+            move = move.code
+        start = move & 63
+        end = (move >> 6) & 63
+        pieceMoved = self.squares[start]
+        color = pieceMoved[0]
+        occupied = self.occupied ^ (1 << start)
+        if move & MOVE_ENPASSANT:
+            occupied ^= 1 << ((start & ~7) | (end & 7))
+            gain = [SEE_VALUES["p"]]
+        else:
+            gain = [SEE_VALUES[self.squares[end][1]]]
+        pieceValue = SEE_VALUES[pieceMoved[1]] #value of the piece standing on the square, next to be taken
+        if move & MOVE_PROMOTION:
+            gain[0] += SEE_VALUES["Q"] - SEE_VALUES["p"]
+            pieceValue = SEE_VALUES["Q"]
+        side = "b" if color == "w" else "w"
+        while True:
+            attackers = self.attackersTo(end, occupied) & occupied & self.colorBitboards[side]
+            if not attackers:
+                break
+            for type in "pNBRQK": #least valuable attacker
+                candidates = attackers & self.bitboards[side + type]
+                if candidates:
+                    break
+            bit = candidates & -candidates
+            other = "b" if side == "w" else "w"
+            #the king can only take if the other side has nothing left to take back with
+            if type == "K" and self.attackersTo(end, occupied ^ bit) & (occupied ^ bit) & self.colorBitboards[other]:
+                break
+            gain.append(pieceValue - gain[-1])
+            pieceValue = SEE_VALUES[type]
+            occupied ^= bit
+            side = other
+        #each side can stop capturing whenever continuing would lose material
+        for i in range(len(gain) - 1, 0, -1):
+            gain[i - 1] = -max(-gain[i - 1], gain[i])
+        return gain[0]
+
     #determine if the current player is in check
     def inCheck(self):
         if self.whiteTomove:
@@ -130,266 +994,272 @@ class GameState():
 
     #determine if the enemy can attack the square r, c
     def squareUnderAttack(self,r,c):
-        self.whiteTomove = not self.whiteTomove #switch to opponent's turn
-        oppMoves = self.getAllPossibleMoves()
-        self.whiteTomove = not self.whiteTomove #switch turns back
-        for move in oppMoves:
-            if move.endRow == r and move.endCol == c: #square is under attack
-                return True
-        return False 
-    #All moves without considering checks
-    def getAllPossibleMoves(self):
+        return self.isAttacked(r*8 + c, "b" if self.whiteTomove else "w")
+
+    #the squares the generators may move to: anything not taken by the side to move, only enemy pieces
+    #when generating captures or only empty squares for quiet moves. Pawns also check capturesOnly and
+    #quietsOnly because pushes that promote count as captures.
+    #When in check evasionMask holds the checking piece and the squares blocking it, the king keeps its own mask
+    def setTargetMask(self, capturesOnly, quietsOnly=False, evasionMask=-1):
+        self.capturesOnly = capturesOnly
+        self.quietsOnly = quietsOnly
+        if capturesOnly:
+            self.kingTargetMask = self.colorBitboards["b" if self.whiteTomove else "w"]
+        elif quietsOnly:
+            self.kingTargetMask = ~self.occupied
+        else:
+            self.kingTargetMask = ~self.colorBitboards["w" if self.whiteTomove else "b"]
+        self.evasionMask = evasionMask
+        self.targetMask = self.kingTargetMask & evasionMask
+
+    #All moves without considering checks as packed move codes, except that pieces other than the king
+    #only move to squares in evasionMask
+    def getAllPossibleMoves(self, capturesOnly=False, quietsOnly=False, evasionMask=-1):
+        self.setTargetMask(capturesOnly, quietsOnly, evasionMask)
         moves = []
-        for r in range(len(self.board)): #no. of rows
-            for c in range(len(self.board[r])): #no. of columns in given row
-                turn = self.board[r][c][0]
-                if (turn == "w" and self.whiteTomove) or (turn == "b" and not self.whiteTomove):
-                    piece = self.board[r][c][1]
-                    self.moveFunctions[piece](r,c, moves) #calls the appropriate move functions based on piece type
+        squares = self.squares
+        #colorBitboards is the set of squares holding the side's pieces, kept up to date by makeMove and undoMove,
+        #so only occupied squares are visited
+        pieces = self.colorBitboards["w" if self.whiteTomove else "b"]
+        while pieces:
+            bit = pieces & -pieces
+            pieces ^= bit
+            sq = bit.bit_length() - 1
+            MOVE_FUNCTIONS[squares[sq][1]](self, sq >> 3, sq & 7, moves) #calls the appropriate move functions based on piece type
         return moves
    
          
     #this will get all the pawn moves for the pawn located at row, col and add these moves to the list
     def getPawnMoves(self,r,c,moves):
-        piecePinned = False
-        pinDirection = ()
-        for i in range(len(self.pins)-1,-1,-1):
-            if self.pins[i][0] == r and self.pins[i][1] == c:
-                piecePinned = True
-                pinDirection = (self.pins[i][2], self.pins[i][3])
-                self.pins.remove(self.pins[i])
-                break
+        sq = r*8 + c
+        #a pinned pawn can only move along the line it is pinned on
+        allowed = self.pins.get(sq, -1) & self.evasionMask
         if self.whiteTomove: #white pawn moves
-
-            if self.board[r-1][c] == "--": #1 square pawn advance
-                if not piecePinned or pinDirection == (-1,0):
-                    moves.append(Move((r,c),(r-1,c),self.board))
-                    if r == 6 and self.board[r-2][c] == "--": #2square pawn advance
-                        moves.append(Move((r,c),(r-2,c), self.board))
+            forward = sq - 8
+            doubleSq = sq - 16 if r == 6 else -1
+            color, enemyColor = "w", "b"
+        else: #blackpawnmoves
+            forward = sq + 8
+            doubleSq = sq + 16 if r == 1 else -1
+            color, enemyColor = "b", "w"
+        occupied = self.occupied
+        if self.capturesOnly:
+            quietAllowed = forward < 8 or forward >= 56 #pushes that promote count as captures
+        else:
+            quietAllowed = not self.quietsOnly or 8 <= forward < 56
+        promotion = PROMOTE_QUEEN if forward < 8 or forward >= 56 else 0 #pawnpromotions
+        if quietAllowed and not (occupied >> forward) & 1:
+            if (allowed >> forward) & 1: #1 square pawn advance
+                moves.append(sq | forward << 6 | promotion)
+            if doubleSq >= 0 and not (occupied >> doubleSq) & 1 and (allowed >> doubleSq) & 1: #2square pawn advance
+                moves.append(sq | doubleSq << 6)
+        if self.quietsOnly:
+            return
         #captures
-            if c-1 >= 0: #captures to the left
-                if self.board[r-1][c-1][0] == "b":  #0 means it's checking whether the piece is enemy piece("b")
-                    if not piecePinned or pinDirection == (-1,-1):
-                        moves.append(Move((r,c),(r-1,c-1),self.board))
-                elif (r-1, c-1) == self.enpassantPossible:
-                    moves.append(Move((r,c),(r-1, c-1), self.board, isEnpassantMove= True))
-
-            if c+1 <= 7: #captures to the right
-                if self.board[r-1][c+1][0] == "b": #enemy piece to capture
-                    if not piecePinned or pinDirection == (-1,1):
-                        moves.append(Move((r, c),(r-1, c+1), self.board))
-                elif (r-1, c+1) == self.enpassantPossible:
-                    moves.append(Move((r,c), (r-1, c+1), self.board, isEnpassantMove = True))
+        targets = PAWN_ATTACKS[color][sq] & allowed & self.colorBitboards[enemyColor]
+        while targets:
+            bit = targets & -targets
+            targets ^= bit
+            moves.append(sq | (bit.bit_length() - 1) << 6 | promotion)
+        if self.enpassantPossible != ():
+            epSq = self.enpassantPossible[0]*8 + self.enpassantPossible[1]
+            captureSq = r*8 + self.enpassantPossible[1]
+            #en passant lands beside the pawn it captures, which may be the checking piece
+            if (PAWN_ATTACKS[color][sq] >> epSq) & 1 and (self.evasionMask & (1 << epSq | 1 << captureSq)) and \
+                    not self.enpassantExposesKing(sq, epSq, captureSq):
+                moves.append(sq | epSq << 6 | MOVE_ENPASSANT)
 
-        else: #blackpawnmoves
-            if self.board[r+1][c] == "--": #1squaremove
-                if not piecePinned or pinDirection == (1, 0):
-                    moves.append(Move((r,c),(r+1,c), self.board))
-                    if r == 1 and self.board[r+2][c] == "--" : #2 square move
-                        moves.append(Move((r,c),(r+2,c), self.board))
-            #captures
-            if c-1 >=0: #capture to left
-                if self.board[r+1][c-1][0] == "w":
-                    if not piecePinned or pinDirection == (1, -1):
-                        moves.append(Move((r,c),(r+1, c-1), self.board))
-                elif (r+1, c-1) == self.enpassantPossible:
-                    moves.append(Move((r,c), (r+1, c-1), self.board, isEnpassantMove = True))
-            if c+1 <= 7: #capture to right
-                if self.board[r+1][c+1][0] == "w":
-                     if not piecePinned or pinDirection == (1, 1):
-                        moves.append(Move((r,c),(r+1,c+1), self.board))
-                elif (r+1, c+1) == self.enpassantPossible:
-                      moves.append(Move((r,c),(r+1,c+1), self.board, isEnpassantMove = True))
-
-        #add pawn promotions later
+    #en passant removes two pawns from the king's side of the board at once, which the pin scan can't see
+    #(e.g. king and enemy rook on the same row as both pawns), so check the king against enemy sliders directly
+    def enpassantExposesKing(self, start, end, captureSq):
+        if self.whiteTomove:
+            kingSq = self.whiteKingLocation[0]*8 + self.whiteKingLocation[1]
+            enemyColor = "b"
+        else:
+            kingSq = self.blackKingLocation[0]*8 + self.blackKingLocation[1]
+            enemyColor = "w"
+        occupied = (self.occupied ^ (1 << start) ^ (1 << captureSq)) | (1 << end)
+        rooks = self.bitboards[enemyColor + "R"] | self.bitboards[enemyColor + "Q"]
+        bishops = self.bitboards[enemyColor + "B"] | self.bitboards[enemyColor + "Q"]
+        return bool(ROOK_ATTACKS[kingSq][occupied & ROOK_MASKS[kingSq]] & rooks or
+                    BISHOP_ATTACKS[kingSq][occupied & BISHOP_MASKS[kingSq]] & bishops)
+
+    #adds a move to every square set in the targets bitboard for the piece on row, col
+    def addMoves(self,r,c,targets,moves):
+        sq = r*8 + c
+        while targets:
+            bit = targets & -targets
+            targets ^= bit
+            moves.append(sq | (bit.bit_length() - 1) << 6)
 
     #this will get all the rook moves for the rook located at row, col and add these moves to the list
     def getRookMoves(self,r,c,moves):
-        piecePinned = False
-        pinDirection = ()
-        for i in range(len(self.pins)-1,-1,-1):
-            if self.pins[i][0] == r and self.pins[i][1] == c:
-                piecePinned = True
-                pinDirection = (self.pins[i][2], self.pins[i][3])
-                if self.board[r][c][1] != "Q": #can't remove queen from pin on rook moves,only remove it on bishop moves
-                    self.pins.remove(self.pins[i])
-                break
-        directions = ((-1,0),(0,-1),(1,0),(0,1))    #up,left,down,right
-        enemyColor = "b" if self.whiteTomove else "w"
-        for d in directions:
-            for i in range(1,8):
-                endRow = r + d[0]*i
-                endCol = c + d[1] *i
-                if 0 <= endRow < 8 and 0 <= endCol <8: #onboard
-                    if not piecePinned or pinDirection == d or pinDirection == (-d[0], -d[1]):
-                        endPiece = self.board[endRow][endCol]
-                        if endPiece == "--": #Empty space valid
-                            moves.append(Move((r,c),(endRow, endCol), self.board))
-                        elif endPiece[0] == enemyColor: #enemyPiece valid
-                            moves.append(Move((r,c),(endRow,endCol), self.board))
-                            break
-                        else: #friendlypiece invalid
-                            break
-                else: #off board
-                    break
+        sq = r*8 + c
+        targets = ROOK_ATTACKS[sq][self.occupied & ROOK_MASKS[sq]] & self.targetMask
+        if sq in self.pins:
+            targets &= self.pins[sq]
+        self.addMoves(r,c,targets,moves)
+
     ##this will get all the knight moves
     def getKnightMoves(self,r,c,moves):
-        piecePinned = False
-        for i in range(len(self.pins)-1,-1,-1):
-            if self.pins[i][0] == r and self.pins[i][1] == c:
-                piecePinned = True
-                self.pins.remove(self.pins[i])
-                break
-        KnightMoves = ((-2,-1),(-2,1),(-1,-2),(-1,2),(1,-2),(1,2),(2,-1),(2,1))
-        enemyColor = "w" if self.whiteTomove else "b"
-        for m in KnightMoves:
-            endRow = r + m[0]
-            endCol = c + m[1]
-            if 0 <= endRow < 8 and 0 <= endCol < 8:
-                if not piecePinned:
-                    endPiece = self.board[endRow][endCol]
-                    if endPiece[0] != enemyColor: # (empty or enemypiece)
-                        moves.append(Move((r,c),(endRow,endCol), self.board))
+        if r*8 + c not in self.pins: #a pinned knight can never move
+            self.addMoves(r,c,KNIGHT_ATTACKS[r*8 + c] & self.targetMask,moves)
+
     #this will get all the Bishop moves
     def getBishopMoves(self,r,c,moves):
-        piecePinned = False
-        pinDirection = ()
-        for i in range(len(self.pins)-1,-1,-1):
-            if self.pins[i][0] == r and self.pins[i][1] == c:
-                piecePinned = True
-                pinDirection = (self.pins[i][2], self.pins[i][3])
-                self.pins.remove(self.pins[i])
-                break
-        directions = ((-1,-1),(-1,1),(1,-1),(1,1)) #4 diaganols
-        enemyColor = "b" if self.whiteTomove else "w"
-        for d in directions:
-            for i in range(1,8): #bishop can move max to 7 squares
-                endRow = r + d[0]*i
-                endCol = c + d[1]*i
-                if 0 <= endRow < 8 and 0 <= endCol < 8: #check if it's still on the board
-                    if not piecePinned or pinDirection == d or pinDirection == (-d[0], -d[1]):
-                        endPiece = self.board[endRow][endCol]
-                        if endPiece == "--": #empty space valid
-                            moves.append(Move((r, c),(endRow, endCol), self.board))
-                        elif endPiece[0] == enemyColor: #enemy piece valid
-                            moves.append(Move((r, c), (endRow, endCol), self.board))
-                            break
-                        else: #friendly piece invalid
-                            break
-                else: #off board
-                    break
+        sq = r*8 + c
+        targets = BISHOP_ATTACKS[sq][self.occupied & BISHOP_MASKS[sq]] & self.targetMask
+        if sq in self.pins:
+            targets &= self.pins[sq]
+        self.addMoves(r,c,targets,moves)
 
-                   
     #this will get all the Queen moves
     def getQueenMoves(self,r,c,moves):
         self.getRookMoves(r,c,moves)
         self.getBishopMoves(r,c,moves)
 
-    ##this will get all the king
+    ##this will get all the king moves, the king can go to any square the enemy doesn't attack
     def getKingMoves(self,r,c,moves):
-        rowMoves = (-1,-1,-1,0,0,1,1,1)
-        colMoves = (-1,0,1,-1,1,-1,0,1)
-        enemyColor = "w" if self.whiteTomove else "b"
-        for i in range(8):
-            endRow = r+ rowMoves[i]
-            endCol = c + colMoves[i]
-            if 0 <= endRow < 8 and 0 <= endCol <8:
-                endPiece = self.board[endRow][endCol]
-                if endPiece[0] != enemyColor: #empty or enemy piece
-                    #place king on end square and check for checks
-                    if enemyColor == "w":
-                        self.whiteKingLocation = (endRow, endCol)
-                    else:
-                        self.blackKingLocation = (endRow, endCol)
-                    inCheck, pins, checks = self.checkForPinsAndChecks()
-                    if not inCheck:
-                        moves.append(Move((r,c),(endRow, endCol), self.board))
-                    #place king back on original location
-                    if enemyColor == "w":
-                        self.whiteKingLocation = (r, c)
-                    else:
-                        self.blackKingLocation = (r, c)
-
-    #returns if the player is in check, a list of pins, and a list of checks
-    def checkForPinsAndChecks(self):
-        pins = [] #squares where the allied pinned piece is and direction pinned from
-        checks = []  #squares where enemy is applying a check
-        inCheck = False
+        sq = r*8 + c
+        targets = KING_ATTACKS[sq] & self.kingTargetMask
+        if targets:
+            #the enemy attack map is built once, with the king left out of the occupancy so a slider
+            #checking it also covers the squares behind the king on the same line
+            enemyAttacks = self.attackMap("b" if self.whiteTomove else "w", self.occupied ^ (1 << sq))
+            self.addMoves(r,c,targets & ~enemyAttacks,moves)
+
+    #bitboard of every square attacked by the pieces of color, with occupied as the pieces blocking the sliders
+    def attackMap(self, color, occupied):
+        bitboards = self.bitboards
+        pawns = bitboards[color + "p"]
+        if color == "w":
+            attacks = ((pawns & ~FILE_A) >> 9) | ((pawns & ~FILE_H) >> 7)
+        else:
+            attacks = (((pawns & ~FILE_A) << 7) | ((pawns & ~FILE_H) << 9)) & FULL_BOARD
+        pieces = bitboards[color + "N"]
+        while pieces:
+            bit = pieces & -pieces
+            pieces ^= bit
+            attacks |= KNIGHT_ATTACKS[bit.bit_length() - 1]
+        queens = bitboards[color + "Q"]
+        pieces = bitboards[color + "R"] | queens
+        while pieces:
+            bit = pieces & -pieces
+            pieces ^= bit
+            sq = bit.bit_length() - 1
+            attacks |= ROOK_ATTACKS[sq][occupied & ROOK_MASKS[sq]]
+        pieces = bitboards[color + "B"] | queens
+        while pieces:
+            bit = pieces & -pieces
+            pieces ^= bit
+            sq = bit.bit_length() - 1
+            attacks |= BISHOP_ATTACKS[sq][occupied & BISHOP_MASKS[sq]]
+        king = bitboards[color + "K"]
+        if king:
+            attacks |= KING_ATTACKS[king.bit_length() - 1]
+        return attacks
+
+    #returns a bitboard of the enemy pieces checking the side to move and a dict of its pinned pieces:
+    #square -> bitboard of the line through the king and the pinning piece, the only squares it can move to.
+    #Only the enemy sliders on the king's lines and the pieces between them and the king are looked at
+    def pinsAndCheckers(self):
         if self.whiteTomove:
-            enemyColor = "b"
-            allyColor = "w"
-            startRow = self.whiteKingLocation[0]
-            startCol = self.whiteKingLocation[1]
+            color, enemyColor = "w", "b"
+            kingSq = self.whiteKingLocation[0]*8 + self.whiteKingLocation[1]
         else:
-            enemyColor = "w"
-            allyColor = "b"
-            startRow = self.blackKingLocation[0]
-            startCol = self.blackKingLocation[1]
-        #check outward from king for pins and checks, keep track of pins
-        directions = ((-1,0),(0,-1),(1,0),(0,1),(-1,-1),(-1,1),(1,-1),(1,1))
-        for j in range(len(directions)):
-            d = directions[j]
-            possiblePin = () #reset possible pins
-            for i in range(1, 8):
-                endRow = startRow + d[0]*i
-                endCol = startCol + d[1]*i
-                if 0 <= endRow < 8 and 0 <= endCol < 8:
-                    endPiece = self.board[endRow][endCol]
-                    if endPiece[0] == allyColor and endPiece[1] != "K":
-                        if possiblePin == (): #1st allied piece could be pinned
-                            possiblePin = (endRow, endCol, d[0], d[1])
-                        else: #2nd allied piece, so no pin or check possible in this direction
-                            break
-                    elif endPiece[0] == enemyColor:
-                        type = endPiece[1]
-                        #5possibilities here in this complex condition
-                        #1 Orthogonally away from  king and piece is a rook
-                        #2 diagonally away from king and piece is a bishop
-                        #3 1 square away diagonally away from king and piece is a pawn
-                        #4 Any direction and piece is a queen
-                        #5 Any direction 1 square away and piece is a king(This is necessary to prevent a king move to a 
-                        # square controlled by another king)
-                        if (0 <= j <= 3 and type == "R") or \
-                            (4 <= j <= 7 and type == "B") or \
-                            (i == 1 and type == "p" and ((enemyColor == "w"and 6 <= j <=7)or (enemyColor == "b"and 4 <=j<=5))) or \
-                            (type == "Q") or (i == 1 and type == "K"):
-                            if possiblePin == (): #no piece blocking, so check
-                                inCheck = True
-                                checks.append((endRow,endCol, d[0], d[1]))
-                                break
-                            else: #piece blocking so pin
-                                pins.append(possiblePin)
-                                break
-                        else: #enemy piece not applying check
-                            break
-                else: #off board
-                    break
-        #check for knight moves
-        Knightmoves = ((-2,-1),(-2,1),(-1,-2),(-1,2),(1,-2),(1,2),(2,-1),(2,1))
-        for m in Knightmoves:
-            endRow = startRow = m[0]
-            endCol = startCol = m[1]
-            if 0 <= endRow <8 and 0 <= endCol <8:
-                endPiece = self.board[endRow][endCol]
-                if endPiece[0] == enemyColor and endPiece[1] == "N": #enemy knight attacking king
-                    inCheck = True
-                    checks.append((endRow, endCol, m[0],m[1]))
-        return inCheck, pins, checks
+            color, enemyColor = "b", "w"
+            kingSq = self.blackKingLocation[0]*8 + self.blackKingLocation[1]
+        bitboards = self.bitboards
+        occupied = self.occupied
+        checkers = self.attackersTo(kingSq, occupied) & self.colorBitboards[enemyColor]
+        pins = {}
+        queens = bitboards[enemyColor + "Q"]
+        #enemy sliders that would attack the king on an empty board
+        snipers = (ROOK_ATTACKS[kingSq][0] & (bitboards[enemyColor + "R"] | queens)) | \
+            (BISHOP_ATTACKS[kingSq][0] & (bitboards[enemyColor + "B"] | queens))
+        own = self.colorBitboards[color]
+        while snipers:
+            bit = snipers & -snipers
+            snipers ^= bit
+            sniperSq = bit.bit_length() - 1
+            blockers = BETWEEN[kingSq][sniperSq] & occupied
+            if blockers & own and not blockers & (blockers - 1): #a single piece in between and it is ours
+                pins[blockers.bit_length() - 1] = LINE[kingSq][sniperSq]
+        return checkers, pins
+
+    #returns if the player is in check, a list of pins, and a list of checks. Pins and checks are
+    #(row, col, direction row, direction col) with the direction from the king, knight checks give the knight's offset
+    def checkForPinsAndChecks(self):
+        checkers, pinned = self.pinsAndCheckers()
+        kingRow, kingCol = self.whiteKingLocation if self.whiteTomove else self.blackKingLocation
+        kingSq = kingRow*8 + kingCol
+        def entry(sq):
+            row, col = SQUARE_COORDS[sq]
+            dr = row - kingRow
+            dc = col - kingCol
+            if LINE[kingSq][sq]: #unit direction along the line
+                dr = (dr > 0) - (dr < 0)
+                dc = (dc > 0) - (dc < 0)
+            return (row, col, dr, dc)
+        pins = [entry(sq) for sq in pinned]
+        checks = []
+        while checkers:
+            bit = checkers & -checkers
+            checkers ^= bit
+            checks.append(entry(bit.bit_length() - 1))
+        return len(checks) > 0, pins, checks
 
 
 
        
 
                   
+#move generator of each piece type, shared by every GameState: MOVE_FUNCTIONS[piece](gs, r, c, moves)
+MOVE_FUNCTIONS = {"p": GameState.getPawnMoves, "R": GameState.getRookMoves, "N": GameState.getKnightMoves,
+                  "B": GameState.getBishopMoves, "Q": GameState.getQueenMoves, "K": GameState.getKingMoves}
+
+
+#compact record of a game for keeping many of them in memory: the starting position in the form of
+#GameState.serialize and the moves played from it as packed move codes, 2 bytes each
+class Position():
+    __slots__ = ("start", "moves")
+
+    def __init__(self, start, moves=()):
+        self.start = start
+        self.moves = array("H", moves)
+
+    #records the game played so far in gs, gs is left as it was
+    @classmethod
+    def fromGameState(cls, gs):
+        moves = list(gs.movelog)
+        for move in moves:
+            gs.undoMove()
+        start = gs.serialize()
+        for move in moves:
+            gs.makeMove(move)
+        return cls(start, moves)
+
+    #replays the game into a new GameState, its moves can be undone as usual
+    def toGameState(self):
+        gs = GameState.deserialize(self.start)
+        for move in self.moves:
+            gs.makeMove(move)
+        return gs
+
+
+#maps keys to values
+#key : value
+RANKS_TO_ROWS = {"1":7, "2":6, "3":5, "4":4,
+                 "5": 3, "6": 2,"7":1,"8":0}
+ROWS_TO_RANKS = {v: k for k, v in RANKS_TO_ROWS.items() }
+FILES_TO_COLS = {"a":0, "b":1, "c":2, "d":3,
+                 "e":4, "f":5,"g":6, "h":7}
+COLS_TO_FILES = {v: k for k, v in FILES_TO_COLS.items()}
+
+
 class Move():
-    #maps keys to values
-    #key : value
-    ranksToRows = {"1":7, "2":6, "3":5, "4":4,
-                    "5": 3, "6": 2,"7":1,"8":0}
-    rowsToRanks = {v: k for k, v in ranksToRows.items() }
-    filesToCols = {"a":0, "b":1, "c":2, "d":3,
-                    "e":4, "f":5,"g":6, "h":7}
-    colsToFiles = {v: k for k, v in filesToCols.items()}
+    __slots__ = ("startRow", "startCol", "endRow", "endCol", "pieceMoved", "pieceCaptured",
+                 "isPawnPromotion", "isEnpassantMove", "moveID", "code")
 
     def __init__(self, startSq, endSq, board, isEnpassantMove = False):
 
@@ -411,7 +1281,26 @@ class Move():
 
 
         self.moveID = self.startRow * 1000 + self.startCol * 100 + self.endRow * 10 + self.endCol
-       
+        #packed move code used by the engine
+        self.code = self.startRow*8 + self.startCol | (self.endRow*8 + self.endCol) << 6
+        if self.isEnpassantMove:
+            self.code |= MOVE_ENPASSANT
+        elif self.isPawnPromotion:
+            self.code |= PROMOTE_QUEEN
+
+    #builds the Move for a packed move code without looking at a board
+    @classmethod
+    def fromCode(cls, code, pieceMoved, pieceCaptured):
+        move = cls.__new__(cls)
+        move.startRow, move.startCol = SQUARE_COORDS[code & 63]
+        move.endRow, move.endCol = SQUARE_COORDS[(code >> 6) & 63]
+        move.pieceMoved = pieceMoved
+        move.pieceCaptured = pieceCaptured
+        move.isPawnPromotion = bool(code & MOVE_PROMOTION)
+        move.isEnpassantMove = bool(code & MOVE_ENPASSANT)
+        move.moveID = move.startRow * 1000 + move.startCol * 100 + move.endRow * 10 + move.endCol
+        move.code = code
+        return move
 
     #over riding the equals method
     def __eq__(self, other):
@@ -423,7 +1312,26 @@ class Move():
         return self.getRankFile(self.startRow, self.startCol) + self.getRankFile(self.endRow, self.endCol)
         
     def getRankFile(self,r,c):
-        return self.colsToFiles[c] + self.rowsToRanks[r]
+        return COLS_TO_FILES[c] + ROWS_TO_RANKS[r]
+
+
+#the list of Moves returned by GameState.getValidMoves, indexed for the UI so a click is matched with one
+#lookup instead of a scan over every move
+class MoveList(list):
+    def __init__(self, moves=()):
+        super().__init__(moves)
+        self.byID = {} #moveID -> Move
+        self.fromSquare = {} #(row, col) -> the Moves starting on that square
+        for move in self:
+            self.byID[move.moveID] = move
+            self.fromSquare.setdefault((move.startRow, move.startCol), []).append(move)
+
+
+#chess notation of a packed move code, the same as Move.getChessNotation
+def moveNotation(code):
+    start = code & 63
+    end = (code >> 6) & 63
+    return "abcdefgh"[start & 7] + str(8 - (start >> 3)) + "abcdefgh"[end & 7] + str(8 - (end >> 3))
 
 
 
@@ -0,0 +1,213 @@
+"""
+Static evaluation for the search: material and piece-square tables (chessengine.PST_MIDGAME, PST_ENDGAME) and the
+pawn structure, blended from the middlegame to the endgame values as pieces come off the board (tapered evaluation).
+GameState.makeMove and undoMove keep the table sums (pieceSquareScore) and the game phase up to date, so
+evaluate() takes the same time in every position.
+
+The pawn structure terms (doubled, isolated, backward and passed pawns) only change when a pawn moves or is taken,
+so they are cached in a PawnHashTable keyed by GameState.pawnKey. The pawn shield in front of each king depends on
+where the king stands and is counted outside the cache, it is two bitboard lookups.
+
+With CHECK_INCREMENTAL set, evaluate() also works the sums out from scratch and raises ValueError when they
+don't match the incremental ones (search.py --check-eval). Run it from the Chess folder to check them over random games:
+
+python -m utilities.evaluation --games 200 --plies 200
+"""
+import argparse
+import json
+import random
+import sys
+from array import array
+
+from utilities.chessengine import FILE_A, FULL_BOARD, PAWN_ATTACKS, PHASE_TOTAL, packScore, unpackScore
+
+CHECK_INCREMENTAL = False #compare the incremental sums against a full recompute at every evaluation
+PAWN_TABLE_ENTRIES = 16384
+
+#pawn structure terms as packed middlegame/endgame scores
+DOUBLED_PAWN = packScore(-10, -20) #for every pawn on a file after the first
+ISOLATED_PAWN = packScore(-10, -15) #no pawn of the same color on the files beside it
+BACKWARD_PAWN = packScore(-8, -10) #the pawns beside it are all ahead and an enemy pawn guards the square in front
+PASSED_PAWN_MIDGAME = (0, 5, 10, 15, 25, 40, 60, 0) #by rank from the pawn's side, a passed pawn has no enemy pawns
+PASSED_PAWN_ENDGAME = (0, 10, 15, 25, 45, 75, 120, 0) #in front of it on its own file or the files beside it
+PAWN_SHIELD = packScore(10, 0) #for every pawn on the three files around the king one or two ranks in front of it
+
+FILE_MASKS = tuple(FILE_A << col for col in range(8))
+ADJACENT_FILES = tuple((FILE_MASKS[col - 1] if col > 0 else 0) | (FILE_MASKS[col + 1] if col < 7 else 0)
+                       for col in range(8))
+#squares on the rows in front of row r for a pawn of each color, white pawns move towards row 0
+AHEAD = {
+    "w": tuple((1 << r*8) - 1 for r in range(8)),
+    "b": tuple(FULL_BOARD ^ ((1 << (r + 1)*8) - 1) for r in range(8)),
+}
+PASSED_MASKS = {color: tuple((FILE_MASKS[sq & 7] | ADJACENT_FILES[sq & 7]) & AHEAD[color][sq >> 3] for sq in range(64))
+                for color in AHEAD}
+#squares of the pawns that could defend a pawn on sq: the files beside it, on its own row or behind
+SUPPORT_MASKS = {color: tuple(ADJACENT_FILES[sq & 7] & ~AHEAD[color][sq >> 3] for sq in range(64)) for color in AHEAD}
+PASSED_PAWN_BONUS = {
+    "w": tuple(packScore(PASSED_PAWN_MIDGAME[7 - (sq >> 3)], PASSED_PAWN_ENDGAME[7 - (sq >> 3)]) for sq in range(64)),
+    "b": tuple(packScore(PASSED_PAWN_MIDGAME[sq >> 3], PASSED_PAWN_ENDGAME[sq >> 3]) for sq in range(64)),
+}
+SHIELD_MASKS = {
+    "w": tuple((FILE_MASKS[sq & 7] | ADJACENT_FILES[sq & 7]) & AHEAD["w"][sq >> 3] & ~AHEAD["w"][max((sq >> 3) - 2, 0)]
+               for sq in range(64)),
+    "b": tuple((FILE_MASKS[sq & 7] | ADJACENT_FILES[sq & 7]) & AHEAD["b"][sq >> 3] & ~AHEAD["b"][min((sq >> 3) + 2, 7)]
+               for sq in range(64)),
+}
+
+
+#caches pawn structure scores by GameState.pawnKey, one entry per slot and a new entry replaces the old one.
+#An empty slot holds key 0 and score 0, which is the right score for the pawnless positions that have key 0
+class PawnHashTable():
+    def __init__(self, entries=PAWN_TABLE_ENTRIES):
+        self.entries = entries
+        self.clear()
+
+    def clear(self):
+        self.keys = array("Q", bytes(8 * self.entries))
+        self.scores = array("q", bytes(8 * self.entries))
+        self.hits = 0
+        self.misses = 0
+
+    #the packed score stored for the pawn key, or None
+    def probe(self, key):
+        i = key % self.entries
+        if self.keys[i] == key:
+            self.hits += 1
+            return self.scores[i]
+        self.misses += 1
+        return None
+
+    def store(self, key, score):
+        i = key % self.entries
+        self.keys[i] = key
+        self.scores[i] = score
+
+    def stats(self):
+        probes = self.hits + self.misses
+        return {
+            "entries": self.entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / probes, 4) if probes else 0.0,
+        }
+
+
+#packed score of the pawn structure from white's side
+def pawnStructure(whitePawns, blackPawns):
+    score = 0
+    for color, pawns, enemyPawns in (("w", whitePawns, blackPawns), ("b", blackPawns, whitePawns)):
+        side = 0
+        for fileMask in FILE_MASKS:
+            onFile = pawns & fileMask
+            if onFile & (onFile - 1):
+                side += DOUBLED_PAWN * (bin(onFile).count("1") - 1)
+        passedMasks = PASSED_MASKS[color]
+        supportMasks = SUPPORT_MASKS[color]
+        passedBonus = PASSED_PAWN_BONUS[color]
+        attacks = PAWN_ATTACKS[color]
+        forward = -8 if color == "w" else 8
+        bits = pawns
+        while bits:
+            bit = bits & -bits
+            bits ^= bit
+            sq = bit.bit_length() - 1
+            if not pawns & ADJACENT_FILES[sq & 7]:
+                side += ISOLATED_PAWN
+            #an enemy pawn guards the square in front if a pawn of ours there would attack it
+            elif not pawns & supportMasks[sq] and attacks[sq + forward] & enemyPawns:
+                side += BACKWARD_PAWN
+            if not enemyPawns & passedMasks[sq]:
+                side += passedBonus[sq]
+        score += side if color == "w" else -side
+    return score
+
+
+#packed pawn structure score of gs from white's side, taken from pawnTable when it is there
+def pawnScore(gs, pawnTable=None):
+    if pawnTable is not None:
+        score = pawnTable.probe(gs.pawnKey)
+        if score is not None:
+            return score
+    score = pawnStructure(gs.bitboards["wp"], gs.bitboards["bp"])
+    if pawnTable is not None:
+        pawnTable.store(gs.pawnKey, score)
+    return score
+
+
+#packed score of the pawns sheltering each king, from white's side
+def kingShield(gs):
+    bitboards = gs.bitboards
+    white = SHIELD_MASKS["w"][bitboards["wK"].bit_length() - 1] & bitboards["wp"]
+    black = SHIELD_MASKS["b"][bitboards["bK"].bit_length() - 1] & bitboards["bp"]
+    return PAWN_SHIELD * (bin(white).count("1") - bin(black).count("1"))
+
+
+#blends a packed middlegame/endgame score by the phase, from white's side
+def taper(score, phase):
+    midgame, endgame = unpackScore(score)
+    phase = min(phase, PHASE_TOTAL) #promotions can take it past the starting material
+    return (midgame * phase + endgame * (PHASE_TOTAL - phase)) // PHASE_TOTAL
+
+
+#score of the position from the point of view of the side to move, pawnTable caches the pawn structure
+def evaluate(gs, pawnTable=None):
+    if CHECK_INCREMENTAL:
+        checkIncremental(gs, pawnTable)
+    score = taper(gs.pieceSquareScore + pawnScore(gs, pawnTable) + kingShield(gs), gs.phase)
+    return score if gs.whiteTomove else -score
+
+
+#raises ValueError if the sums and the pawn key makeMove kept up to date differ from the ones computed from the
+#board, or if pawnTable holds a wrong score for the pawns
+def checkIncremental(gs, pawnTable=None):
+    score, phase = gs.computePieceSquareScore()
+    if score != gs.pieceSquareScore or phase != gs.phase:
+        raise ValueError("incremental evaluation %s, phase %d doesn't match the full recompute %s, phase %d in %s" %
+                         (unpackScore(gs.pieceSquareScore), gs.phase, unpackScore(score), phase, gs.to_fen()))
+    if gs.pawnKey != gs.computePawnKey():
+        raise ValueError("incremental pawn key doesn't match the full recompute in %s" % gs.to_fen())
+    if pawnTable is not None:
+        i = gs.pawnKey % pawnTable.entries
+        if pawnTable.keys[i] == gs.pawnKey and pawnTable.scores[i] != pawnStructure(gs.bitboards["wp"], gs.bitboards["bp"]):
+            raise ValueError("pawn hash table score doesn't match the pawn structure in %s" % gs.to_fen())
+
+
+#plays random games and checks the incremental sums after every move and every undo, returns the number of
+#positions checked and the first mismatch found (None if there is none)
+def checkRandomGames(games=100, plies=200, seed=1):
+    from utilities import chessengine
+    rnd = random.Random(seed)
+    positions = 0
+    try:
+        for game in range(games):
+            gs = chessengine.GameState()
+            for ply in range(plies):
+                moves = gs.getValidMoveCodes()
+                if not moves:
+                    break
+                gs.makeMove(rnd.choice(moves))
+                checkIncremental(gs)
+                positions += 1
+            while gs.movelog:
+                gs.undoMove()
+                checkIncremental(gs)
+                positions += 1
+    except ValueError as e:
+        return positions, str(e)
+    return positions, None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the incremental evaluation against a full recompute")
+    parser.add_argument("--games", type=int, default=100, help="random games to play (default 100)")
+    parser.add_argument("--plies", type=int, default=200, help="most plies per game (default 200)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for the games played")
+    args = parser.parse_args(argv)
+    positions, mismatch = checkRandomGames(args.games, args.plies, args.seed)
+    print(json.dumps({"games": args.games, "positions": positions, "mismatch": mismatch}, indent=2))
+    return 0 if mismatch is None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+Move ordering for the search. Alpha-beta cuts off sooner the earlier the best move is tried, so the moves
+of a position are handed out in stages, best first:
+1. the hash move (best move found for this position before, from the transposition table)
+2. captures and promotions, most valuable victim first and least valuable attacker first (MVV-LVA)
+3. killer moves: quiet moves that caused a cutoff at the same ply in another part of the tree
+4. the other quiet moves, by how often they caused cutoffs so far (history heuristic)
+5. captures that lose material by static exchange evaluation (GameState.see)
+A stage is only generated when the moves before it didn't cause a cutoff.
+Moves are the packed move codes of chessengine, the position is needed to tell what they move and capture.
+"""
+from utilities.chessengine import MOVE_ENPASSANT, MOVE_FLAGS, MOVE_PROMOTION
+
+PIECE_VALUES = {"p": 100, "N": 320, "B": 330, "R": 500, "Q": 900, "K": 0, "-": 0}
+MAX_PLY = 128
+HISTORY_LIMIT = 1 << 20 #the history table is halved when a score gets this big
+
+
+#value of the piece the move captures in gs (0 for none)
+def victimValue(gs, move):
+    if move & MOVE_ENPASSANT:
+        return PIECE_VALUES["p"]
+    return PIECE_VALUES[gs.squares[(move >> 6) & 63][1]]
+
+
+#most valuable victim, least valuable attacker: bigger captures first, cheaper capturing pieces first
+def captureScore(gs, move):
+    score = victimValue(gs, move) * 10 - PIECE_VALUES[gs.squares[move & 63][1]] // 10
+    if move & MOVE_PROMOTION:
+        score += PIECE_VALUES["Q"] * 10
+    return score
+
+
+#True if the capture loses material once the exchange on its square is played out.
+#Taking a piece worth at least as much as the capturing one can't lose, so see() only runs for the others
+def isLosingCapture(gs, move):
+    return victimValue(gs, move) < PIECE_VALUES[gs.squares[move & 63][1]] and gs.see(move) < 0
+
+
+def isQuiet(gs, move):
+    return not move & MOVE_FLAGS and gs.squares[(move >> 6) & 63] == "--"
+
+
+class MoveOrdering():
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.killers = [[0, 0] for ply in range(MAX_PLY + 1)] #two killer move codes per ply
+        self.history = {"w": [0] * 4096, "b": [0] * 4096} #cutoff scores per side, indexed by start | end << 6
+
+    #called at the start of a new search: old killers don't apply to the new root and history counts less
+    def newSearch(self):
+        self.killers = [[0, 0] for ply in range(MAX_PLY + 1)]
+        for color in self.history:
+            self.history[color] = [score // 2 for score in self.history[color]]
+
+    #yields the legal moves of gs best first, generating each stage only when it is reached
+    def orderedMoves(self, gs, ply, hashMove=0):
+        if hashMove:
+            if gs.isValidMove(hashMove):
+                yield hashMove
+            else:
+                hashMove = 0
+
+        captures = gs.getValidMoveCodes(capturesOnly=True)
+        captures.sort(key=lambda move: captureScore(gs, move), reverse=True)
+        losingCaptures = []
+        for move in captures:
+            if move != hashMove:
+                if isLosingCapture(gs, move):
+                    losingCaptures.append(move)
+                else:
+                    yield move
+
+        killers = []
+        for move in self.killers[ply]:
+            if move and move != hashMove and isQuiet(gs, move) and gs.isValidMove(move):
+                killers.append(move)
+                yield move
+
+        quiets = gs.getValidMoveCodes(quietsOnly=True)
+        history = self.history["w" if gs.whiteTomove else "b"]
+        quiets.sort(key=lambda move: history[move & 0xFFF], reverse=True)
+        for move in quiets:
+            if move != hashMove and move not in killers:
+                yield move
+
+        for move in losingCaptures:
+            yield move
+
+    #a quiet move by color caused a beta cutoff at this ply and depth
+    def updateQuietCutoff(self, move, color, ply, depth):
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        history = self.history[color]
+        history[move & 0xFFF] += depth * depth
+        if history[move & 0xFFF] > HISTORY_LIMIT:
+            for color in self.history:
+                self.history[color] = [score // 2 for score in self.history[color]]
@@ -0,0 +1,236 @@
+"""
+Perft benchmark and regression runner.
+Runs GameState.perft on the standard test positions, checks the node counts against the stored reference
+values and reports nodes, time and nodes/sec as JSON. It also checks that GameState.from_fen rejects malformed
+FENs (MALFORMED_FENS) and gives FENs of the same position equal keys (EQUAL_FENS). Run it from the Chess folder:
+
+python -m utilities.perft --depth 3
+python -m utilities.perft --position kiwipete --depth 2 --divide
+python -m utilities.perft --depth 3 --save-baseline
+python -m utilities.perft --position start --depth 5 --workers 8
+
+A saved baseline (perft_baseline.json by default) stores the nodes/sec of each position, later runs are
+flagged as a regression when they are slower than the baseline by more than the tolerance.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from utilities import chessengine
+
+#The engine doesn't castle and always promotes to a queen, so the reference counts are for the standard
+#positions without castling rights and with queen promotions only. For the start position and position 3
+#they are the published numbers, the others were computed with an independent move generator.
+#name -> (board, whiteTomove, {depth: nodes}), board None is the starting position
+POSITIONS = {
+    "start": (None, True, {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609, 6: 119060324}),
+    "kiwipete": ([
+        ["bR","--","--","--","bK","--","--","bR"],
+        ["bp","--","bp","bp","bQ","bp","bB","--"],
+        ["bB","bN","--","--","bp","bN","bp","--"],
+        ["--","--","--","wp","wN","--","--","--"],
+        ["--","bp","--","--","wp","--","--","--"],
+        ["--","--","wN","--","--","wQ","--","bp"],
+        ["wp","wp","wp","wB","wB","wp","wp","wp"],
+        ["wR","--","--","--","wK","--","--","wR"],
+    ], True, {1: 46, 2: 1866, 3: 86677, 4: 3494043}),
+    "position3": ([
+        ["--","--","--","--","--","--","--","--"],
+        ["--","--","bp","--","--","--","--","--"],
+        ["--","--","--","bp","--","--","--","--"],
+        ["wK","wp","--","--","--","--","--","bR"],
+        ["--","wR","--","--","--","bp","--","bK"],
+        ["--","--","--","--","--","--","--","--"],
+        ["--","--","--","--","wp","--","wp","--"],
+        ["--","--","--","--","--","--","--","--"],
+    ], True, {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624}),
+    "position4": ([
+        ["bR","--","--","--","bK","--","--","bR"],
+        ["wp","bp","bp","bp","--","bp","bp","bp"],
+        ["--","bB","--","--","--","bN","bB","wN"],
+        ["bN","wp","--","--","--","--","--","--"],
+        ["wB","wB","wp","--","wp","--","--","--"],
+        ["bQ","--","--","--","--","wN","--","--"],
+        ["wp","bp","--","wp","--","--","wp","wp"],
+        ["wR","--","--","wQ","--","wR","wK","--"],
+    ], True, {1: 6, 2: 222, 3: 7859, 4: 306124}),
+    "position5": ([
+        ["bR","bN","bB","bQ","--","bK","--","bR"],
+        ["bp","bp","--","wp","bB","bp","bp","bp"],
+        ["--","--","bp","--","--","--","--","--"],
+        ["--","--","--","--","--","--","--","--"],
+        ["--","--","wB","--","--","--","--","--"],
+        ["--","--","--","--","--","--","--","--"],
+        ["wp","wp","wp","--","wN","bN","wp","wp"],
+        ["wR","wN","wB","wQ","wK","--","--","wR"],
+    ], True, {1: 40, 2: 1339, 3: 51750, 4: 1729274}),
+    "position6": ([
+        ["bR","--","--","--","--","bR","bK","--"],
+        ["--","bp","bp","--","bQ","bp","bp","bp"],
+        ["bp","--","bN","bp","--","bN","--","--"],
+        ["--","--","bB","--","bp","--","wB","--"],
+        ["--","--","wB","--","wp","--","bB","--"],
+        ["wp","--","wN","wp","--","wN","--","--"],
+        ["--","wp","wp","--","wQ","wp","wp","wp"],
+        ["wR","--","--","--","--","wR","wK","--"],
+    ], True, {1: 46, 2: 2079, 3: 89890, 4: 3894594}),
+}
+
+#FENs GameState.from_fen must reject with a ValueError
+MALFORMED_FENS = [
+    "k7/8/8/3P4/8/8/8/K7 w - e6 0 1", #no black pawn to take en passant
+    "k7/8/8/3Pp3/8/8/8/K7 w - e3 0 1", #en passant square on the wrong side's rank
+    "k7/8/4p3/3Pp3/8/8/8/K7 w - e6 0 1", #en passant square occupied
+    "k6P/8/8/8/8/8/8/K7 w - - 0 1", #pawn on the last rank
+    "k7/8/8/8/8/8/8/K6K w - - 0 1", #two white kings
+]
+#pairs of FENs for the same position, castling rights without their king or rook on its square are dropped
+EQUAL_FENS = [
+    ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQ1BNK w KQkq - 0 1",
+     "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQ1BNK w kq - 0 1"),
+    ("4k3/8/8/8/8/8/8/4K3 b KQkq - 0 1", "4k3/8/8/8/8/8/8/4K3 b - - 0 1"),
+]
+
+
+#returns a GameState set up on one of the test positions
+def loadPosition(name):
+    board, whiteTomove, expected = POSITIONS[name]
+    return chessengine.GameState(board, whiteTomove)
+
+
+#counts the nodes below one root move, runs in a worker process.
+#The position comes in serialized form and the move as its packed code so nothing with bound methods is pickled
+def perftWorker(data, move, depth):
+    gs = chessengine.GameState.deserialize(data)
+    if move not in gs.getValidMoveCodes():
+        raise ValueError("move %d is not a valid move in this position" % move)
+    gs.makeMove(move)
+    return chessengine.moveNotation(move), gs.perft(depth - 1)
+
+
+#divide with the root moves spread over a pool of worker processes, returns move notation -> nodes
+def parallelDivide(gs, depth, workers=None):
+    data = gs.serialize()
+    moves = gs.getValidMoveCodes()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(perftWorker, [data]*len(moves), moves, [depth]*len(moves))
+        return dict(results)
+
+
+#perft with the root moves spread over a pool of worker processes
+def parallelPerft(gs, depth, workers=None):
+    if depth <= 1:
+        return gs.perft(depth)
+    return sum(parallelDivide(gs, depth, workers).values())
+
+
+#runs perft on one position and returns the result as a dict, workers > 1 splits the root moves across processes
+def runPosition(name, depth, workers=1):
+    gs = loadPosition(name)
+    start = time.perf_counter()
+    nodes = parallelPerft(gs, depth, workers) if workers > 1 else gs.perft(depth)
+    seconds = time.perf_counter() - start
+    expected = POSITIONS[name][2].get(depth)
+    return {
+        "position": name,
+        "depth": depth,
+        "nodes": nodes,
+        "expected": expected,
+        "correct": expected is None or nodes == expected,
+        "seconds": round(seconds, 4),
+        "nps": round(nodes / seconds) if seconds > 0 else 0,
+        "workers": workers,
+    }
+
+
+#checks the FEN parser against MALFORMED_FENS and EQUAL_FENS, returns a description of every failure
+def checkFens():
+    failures = []
+    for fen in MALFORMED_FENS:
+        try:
+            chessengine.GameState.from_fen(fen)
+            failures.append("accepted %r" % fen)
+        except ValueError:
+            pass
+    for first, second in EQUAL_FENS:
+        if chessengine.GameState.from_fen(first) != chessengine.GameState.from_fen(second):
+            failures.append("%r and %r differ" % (first, second))
+    return failures
+
+
+#baseline entries are per position, depth and number of workers
+def baselineKey(result):
+    key = result["position"] + ":" + str(result["depth"])
+    if result["workers"] > 1:
+        key += ":" + str(result["workers"]) + "workers"
+    return key
+
+
+#marks every result that is slower than the baseline by more than tolerance (a fraction of the baseline nps)
+def compareToBaseline(results, baseline, tolerance):
+    regressions = 0
+    for result in results:
+        key = baselineKey(result)
+        if key in baseline:
+            result["baselineNps"] = baseline[key]
+            result["regression"] = result["nps"] < baseline[key] * (1 - tolerance)
+            regressions += result["regression"]
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perft benchmark and move generation regression test")
+    parser.add_argument("--position", action="append", choices=sorted(POSITIONS),
+                        help="position to run (can be repeated, default all)")
+    parser.add_argument("--depth", type=int, default=3, help="perft depth (default 3)")
+    parser.add_argument("--divide", action="store_true", help="print the node count below each root move")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes to split the root moves across (default 1, 0 uses every core)")
+    parser.add_argument("--baseline", default="perft_baseline.json", help="baseline file to compare speed against")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run's nodes/sec as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="allowed slowdown against the baseline before flagging a regression (default 0.1)")
+    args = parser.parse_args(argv)
+    if args.depth < 1:
+        parser.error("--depth must be at least 1")
+    names = args.position or list(POSITIONS)
+    workers = args.workers or os.cpu_count()
+
+    if args.divide:
+        if workers > 1:
+            report = {name: parallelDivide(loadPosition(name), args.depth, workers) for name in names}
+        else:
+            report = {name: loadPosition(name).divide(args.depth) for name in names}
+        print(json.dumps(report, indent=2))
+        return 0
+
+    results = [runPosition(name, args.depth, workers) for name in names]
+    regressions = 0
+    if args.save_baseline:
+        baseline = {baselineKey(r): r["nps"] for r in results}
+        if os.path.exists(args.baseline): #keep the other depths already in the file
+            with open(args.baseline) as f:
+                baseline = dict(json.load(f), **baseline)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compareToBaseline(results, json.load(f), args.tolerance)
+    fenFailures = checkFens()
+    report = {
+        "results": results,
+        "nodes": sum(r["nodes"] for r in results),
+        "seconds": round(sum(r["seconds"] for r in results), 4),
+        "fenFailures": fenFailures,
+        "correct": all(r["correct"] for r in results) and not fenFailures,
+        "regressions": regressions,
+    }
+    print(json.dumps(report, indent=2))
+    return 0 if report["correct"] and not regressions else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
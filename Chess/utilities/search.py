@@ -0,0 +1,554 @@
+"""
+Search engine: picks a move for the side to move in a GameState.
+Negamax alpha-beta with iterative deepening and a captures-only quiescence search at the horizon that skips captures
+losing material by static exchange evaluation. Every move after the first is searched with a null window to prove it
+is no better (principal variation search), and only searched again with the full window when it is. From depth
+ASPIRATION_MIN_DEPTH on, each iteration starts with a window around the previous score, widened when the score falls
+outside (aspiration windows). Each iteration reports its depth, score, nodes, nodes/sec, effective branching factor
+and principal variation, and the search can be stopped at any point by a time or node budget or by calling stop().
+The result of the last completed iteration is kept. Run it from the Chess folder to analyse a test position:
+
+python -m utilities.search --position kiwipete --time 5
+python -m utilities.search --position kiwipete --depth 5 --workers 4
+python -m utilities.search --position kiwipete --depth 5 --no-pruning lmr
+
+The search is selective, each technique can be switched off (pruning argument of Search, --no-pruning) to measure
+what it saves and every one keeps counters in the iteration reports:
+nullmove: pass the turn (GameState.makeNullMove) and search shallower, if the side to move still scores at least
+          beta its real moves will too
+lmr: late move reductions, quiet moves ordered late are searched shallower first, and again at full depth
+     only when they beat alpha
+futility: near the horizon, quiet moves are skipped when the static score is too far below alpha for them to catch up
+razoring: near the horizon, a position far below alpha gets only the quiescence search
+The reports also count the null window searches and re-searches, and the aspiration fail highs and lows.
+
+ParallelSearch spreads a search over several processes (lazy SMP): the main search runs as usual while helper
+processes search the same position with their own depth offset and move order. They don't split the work
+explicitly, they share one transposition table and the main search picks up what the helpers have stored.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from utilities import chessengine, evaluation
+from utilities.evaluation import PawnHashTable, evaluate
+from utilities.moveordering import MoveOrdering, PIECE_VALUES, MAX_PLY, captureScore, isLosingCapture, isQuiet, victimValue
+from utilities.transposition import SharedTranspositionTable, TranspositionTable, EXACT, LOWERBOUND, UPPERBOUND
+
+MATE_SCORE = 30000 #score of giving mate now, mate in n plies scores MATE_SCORE - n
+MATE_THRESHOLD = MATE_SCORE - 1000 #scores beyond this are mates
+DELTA_MARGIN = 200 #quiescence skips captures that can't bring the score within this of alpha
+PRUNING = ("nullmove", "lmr", "futility", "razoring") #selective search techniques, all on by default
+NULL_MOVE_MIN_DEPTH = 3 #null move pruning from this depth on
+NULL_MOVE_REDUCTION = 2 #the null move is searched this much shallower (one more from depth 7 on)
+LMR_MIN_DEPTH = 3 #late move reductions from this depth on
+LMR_FULL_MOVES = 3 #moves searched at full depth before any is reduced
+LMR_LATE_MOVES = 8 #moves from this one on are reduced two plies instead of one
+FUTILITY_MARGINS = (0, 200, 450) #by remaining depth: most a quiet move is expected to gain
+RAZOR_MARGINS = (0, 300, 550) #by remaining depth: positions this far below alpha are razored
+ASPIRATION_WINDOW = 50 #half width of the first aspiration window, doubled after every fail
+ASPIRATION_MIN_DEPTH = 3 #iterations from this depth on use an aspiration window
+
+
+#True if the side to move is in check
+def inCheck(gs):
+    return gs.squareUnderAttack(*(gs.whiteKingLocation if gs.whiteTomove else gs.blackKingLocation))
+
+
+#mate scores are stored relative to the node so they stay right when the position is reached at another ply
+def scoreToTT(score, ply):
+    if score > MATE_THRESHOLD:
+        return score + ply
+    if score < -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+def scoreFromTT(score, ply):
+    if score > MATE_THRESHOLD:
+        return score - ply
+    if score < -MATE_THRESHOLD:
+        return score + ply
+    return score
+
+
+class Search():
+    #infoCallback(info) is called with the report of every completed iteration.
+    #workerId > 0 makes this a helper of a parallel search: odd helpers search one ply deeper at every iteration
+    #and each helper starts from a different history table. stopEvent (a multiprocessing.Event) stops the search
+    #once set. pruning lists the selective search techniques to use (see PRUNING), pvs=False searches every move
+    #with the full window and aspirationWindow=0 starts every iteration with the full window
+    def __init__(self, gs, tt=None, ttSizeMB=16, infoCallback=None, workerId=0, stopEvent=None, pruning=PRUNING,
+                 pvs=True, aspirationWindow=ASPIRATION_WINDOW):
+        for name in pruning:
+            if name not in PRUNING:
+                raise ValueError("unknown pruning technique %r" % name)
+        self.gs = gs
+        self.pruning = frozenset(pruning)
+        self.pvs = pvs
+        self.aspirationWindow = aspirationWindow
+        self.tt = tt if tt is not None else TranspositionTable(ttSizeMB)
+        self.infoCallback = infoCallback
+        self.workerId = workerId
+        self.stopEvent = stopEvent
+        self.ordering = MoveOrdering()
+        self.pawnTable = PawnHashTable() #pawn structure scores, kept from one search to the next like the tt
+        if workerId:
+            rnd = random.Random(workerId)
+            for color in self.ordering.history:
+                self.ordering.history[color] = [rnd.randrange(64) for i in range(4096)]
+        self.stopped = False
+        self.nodes = 0
+        self.qnodes = 0 #nodes searched by the quiescence search, included in nodes
+        self.iterations = [] #reports of the completed iterations
+
+    #asks a running search to stop, it returns the best move of the last completed iteration
+    def stop(self):
+        self.stopped = True
+
+    #searches until maxDepth is done or a budget (seconds, nodes) runs out, returns the best move as a packed
+    #move code (None if there are no moves)
+    def search(self, maxDepth=MAX_PLY - 1, timeLimit=None, nodeLimit=None):
+        self.stopped = False
+        self.nodes = 0
+        self.qnodes = 0
+        self.cutoffs = 0 #beta cutoffs in the main search
+        self.firstMoveCutoffs = 0 #cutoffs by the first move tried, measures the move ordering
+        self.pruningStats = {
+            "nullmove": {"tried": 0, "cutoffs": 0},
+            "lmr": {"reduced": 0, "researched": 0},
+            "futility": {"pruned": 0},
+            "razoring": {"tried": 0, "cutoffs": 0},
+        }
+        self.pvsSearches = 0 #null window searches of moves after the first
+        self.pvsResearches = 0 #of those, the ones that beat alpha and were searched again with the full window
+        self.aspirationSearches = 0 #iterations searched with an aspiration window, re-searches included
+        self.failHighs = 0
+        self.failLows = 0
+        self.nullMovePruning = "nullmove" in self.pruning
+        self.lateMoveReductions = "lmr" in self.pruning
+        self.futilityPruning = "futility" in self.pruning
+        self.razoring = "razoring" in self.pruning
+        self.nullMoves = 0 #null moves on the path from the root, the previous principal variation isn't followed below one
+        self.iterations = []
+        self.ordering.newSearch()
+        self.startTime = time.perf_counter()
+        self.timeLimit = timeLimit
+        self.nodeLimit = nodeLimit
+        self.pvTable = [[] for ply in range(MAX_PLY + 1)]
+        rootMoves = self.gs.getValidMoveCodes()
+        if not rootMoves:
+            return None
+        #the move generation below the root rewrites checkMate and staleMate for every node it visits, the ones
+        #for the root are put back when the search returns
+        rootFlags = (self.gs.checkMate, self.gs.staleMate)
+        try:
+            bestMove = rootMoves[0]
+            self.rootPv = []
+            previousNodes = 0
+            previousIterationNodes = 0
+            score = 0
+            for depth in range(1 + (self.workerId & 1), min(maxDepth, MAX_PLY - 1) + 1):
+                self.checkLimits = depth > 1 #the first iteration always finishes so there is a move to play
+                score = self.aspirationSearch(depth, score)
+                if self.stopped:
+                    break
+                self.rootPv = self.pvTable[0][:]
+                bestMove = self.rootPv[0]
+                elapsed = time.perf_counter() - self.startTime
+                iterationNodes = self.nodes - previousNodes
+                info = {
+                    "depth": depth,
+                    "score": score,
+                    "nodes": self.nodes,
+                    "qnodes": self.qnodes,
+                    #nodes of this iteration over those of the one before
+                    "ebf": round(iterationNodes / previousIterationNodes, 2) if previousIterationNodes else 0.0,
+                    "pruning": {name: dict(counters) for name, counters in self.pruningStats.items()},
+                    "pvs": {
+                        "searches": self.pvsSearches,
+                        "researches": self.pvsResearches,
+                        "researchRate": round(self.pvsResearches / self.pvsSearches, 4) if self.pvsSearches else 0.0,
+                    },
+                    "aspiration": {
+                        "searches": self.aspirationSearches,
+                        "failHighs": self.failHighs,
+                        "failLows": self.failLows,
+                        "failHighRate": round(self.failHighs / self.aspirationSearches, 4) if self.aspirationSearches else 0.0,
+                        "failLowRate": round(self.failLows / self.aspirationSearches, 4) if self.aspirationSearches else 0.0,
+                    },
+                    "firstMoveCutoffs": round(self.firstMoveCutoffs / self.cutoffs, 4) if self.cutoffs else 0.0,
+                    "time": round(elapsed, 4),
+                    "nps": round(self.nodes / elapsed) if elapsed > 0 else 0,
+                    "pv": [chessengine.moveNotation(move) for move in self.rootPv],
+                    "hashfull": self.tt.hashfull(),
+                    "pawnHitRate": self.pawnTable.stats()["hitRate"],
+                }
+                previousNodes = self.nodes
+                previousIterationNodes = iterationNodes
+                self.iterations.append(info)
+                if self.infoCallback is not None:
+                    self.infoCallback(info)
+                if abs(score) > MATE_THRESHOLD or len(rootMoves) == 1: #nothing to gain from searching deeper
+                    break
+        finally:
+            self.gs.checkMate, self.gs.staleMate = rootFlags
+        return bestMove
+
+    #searches the root to depth in a window around the score of the previous iteration, widening the side the
+    #score falls out of until it lands inside. Returns the exact score
+    def aspirationSearch(self, depth, previousScore):
+        alpha = -MATE_SCORE - 1
+        beta = MATE_SCORE + 1
+        delta = self.aspirationWindow
+        if delta and depth >= ASPIRATION_MIN_DEPTH and abs(previousScore) < MATE_THRESHOLD:
+            alpha = previousScore - delta
+            beta = previousScore + delta
+        while True:
+            score = self.negamax(depth, alpha, beta, 0)
+            if self.stopped or alpha == -MATE_SCORE - 1 and beta == MATE_SCORE + 1:
+                return score
+            self.aspirationSearches += 1
+            delta *= 2
+            if score <= alpha:
+                self.failLows += 1
+                alpha = max(score - delta, -MATE_SCORE - 1) if abs(score) < MATE_THRESHOLD else -MATE_SCORE - 1
+            elif score >= beta:
+                self.failHighs += 1
+                beta = min(score + delta, MATE_SCORE + 1) if abs(score) < MATE_THRESHOLD else MATE_SCORE + 1
+            else:
+                return score
+
+    #sets self.stopped once the time or node budget is used up
+    def checkBudget(self):
+        if self.nodeLimit is not None and self.nodes >= self.nodeLimit:
+            self.stopped = True
+        elif self.timeLimit is not None and time.perf_counter() - self.startTime >= self.timeLimit:
+            self.stopped = True
+        elif self.stopEvent is not None and self.stopEvent.is_set():
+            self.stopped = True
+
+    #negamax alpha-beta, returns the score of the position for the side to move and fills self.pvTable[ply].
+    #allowNull is False right after a null move, so two are never made in a row
+    def negamax(self, depth, alpha, beta, ply, allowNull=True):
+        gs = self.gs
+        self.nodes += 1
+        if self.checkLimits and self.nodes & 1023 == 0:
+            self.checkBudget()
+        if self.stopped:
+            return 0
+        self.pvTable[ply] = []
+        if depth <= 0 or ply >= MAX_PLY:
+            self.nodes -= 1 #counted again by the quiescence search
+            return self.quiescence(alpha, beta, ply)
+
+        key = gs.zobristKey
+        entry = self.tt.probe(key)
+        hashMove = 0
+        if entry is not None:
+            hashMove = entry[3]
+            if ply > 0 and entry[0] >= depth:
+                ttScore = scoreFromTT(entry[1], ply)
+                bound = entry[2]
+                if bound == EXACT or (bound == LOWERBOUND and ttScore >= beta) or (bound == UPPERBOUND and ttScore <= alpha):
+                    return ttScore
+        #the move of the previous iteration's principal variation goes first
+        if ply < len(self.rootPv) and not self.nullMoves and self.followingPv(ply):
+            hashMove = self.rootPv[ply]
+
+        checked = inCheck(gs)
+        color = "w" if gs.whiteTomove else "b"
+        staticScore = evaluate(gs, self.pawnTable) if ply > 0 and not checked else None
+        if staticScore is not None and abs(beta) < MATE_THRESHOLD:
+            #razoring: so far below alpha that only captures could help, the quiescence search decides
+            if self.razoring and depth < len(RAZOR_MARGINS) and staticScore + RAZOR_MARGINS[depth] <= alpha:
+                self.pruningStats["razoring"]["tried"] += 1
+                score = self.quiescence(alpha, alpha + 1, ply)
+                if self.stopped:
+                    return 0
+                if score <= alpha:
+                    self.pruningStats["razoring"]["cutoffs"] += 1
+                    return score
+            #null move: even passing the turn keeps the score above beta. Not done with only pawns left, where
+            #passing could be the best move (zugzwang)
+            bitboards = gs.bitboards
+            if self.nullMovePruning and allowNull and depth >= NULL_MOVE_MIN_DEPTH and staticScore >= beta and \
+                    bitboards[color + "N"] | bitboards[color + "B"] | bitboards[color + "R"] | bitboards[color + "Q"]:
+                self.pruningStats["nullmove"]["tried"] += 1
+                reduction = NULL_MOVE_REDUCTION + (depth >= 7)
+                gs.makeNullMove()
+                self.nullMoves += 1
+                score = -self.negamax(depth - 1 - reduction, -beta, -beta + 1, ply + 1, False)
+                self.nullMoves -= 1
+                gs.undoNullMove()
+                if self.stopped:
+                    return 0
+                if score >= beta:
+                    self.pruningStats["nullmove"]["cutoffs"] += 1
+                    return beta if score > MATE_THRESHOLD else score #a mate found by passing isn't proven
+        #futility: quiet moves can't bring the score back up to alpha this close to the horizon
+        futile = self.futilityPruning and staticScore is not None and depth < len(FUTILITY_MARGINS) and \
+            abs(alpha) < MATE_THRESHOLD and staticScore + FUTILITY_MARGINS[depth] <= alpha
+        reduce = self.lateMoveReductions and depth >= LMR_MIN_DEPTH and not checked
+        killers = self.ordering.killers[ply]
+        history = self.ordering.history[color]
+
+        alphaOrig = alpha
+        bestScore = -MATE_SCORE - 1
+        bestMove = None
+        movesSearched = 0
+        for move in self.ordering.orderedMoves(gs, ply, hashMove):
+            quiet = (futile or reduce) and isQuiet(gs, move)
+            gs.makeMove(move)
+            if quiet and (futile and movesSearched > 0 or reduce and movesSearched >= LMR_FULL_MOVES) and inCheck(gs):
+                quiet = False #moves giving check are neither pruned nor reduced
+            if quiet and futile and movesSearched > 0:
+                gs.undoMove()
+                self.pruningStats["futility"]["pruned"] += 1
+                continue
+            if movesSearched == 0:
+                score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            else:
+                score = alpha + 1
+                if quiet and reduce and movesSearched >= LMR_FULL_MOVES and move not in killers:
+                    #late move reduction: one ply less, two for the latest moves, one less again for moves with a
+                    #good history. Searched with a null window, only a move beating alpha is searched at full depth
+                    reduction = 1 + (movesSearched >= LMR_LATE_MOVES) - (history[move & 0xFFF] > depth * depth)
+                    if reduction > 0:
+                        self.pruningStats["lmr"]["reduced"] += 1
+                        score = -self.negamax(depth - 1 - reduction, -alpha - 1, -alpha, ply + 1)
+                        if score > alpha and not self.stopped:
+                            self.pruningStats["lmr"]["researched"] += 1
+                if score > alpha:
+                    if self.pvs:
+                        #principal variation search: the first move is expected to be the best, a null window
+                        #is enough to show a later one isn't better. One that is gets the full window
+                        self.pvsSearches += 1
+                        score = -self.negamax(depth - 1, -alpha - 1, -alpha, ply + 1)
+                        if alpha < score < beta and not self.stopped:
+                            self.pvsResearches += 1
+                            score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+                    else:
+                        score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            gs.undoMove()
+            movesSearched += 1
+            if self.stopped:
+                return 0
+            if score > bestScore:
+                bestScore = score
+                bestMove = move
+                if score > alpha:
+                    alpha = score
+                    self.pvTable[ply] = [move] + self.pvTable[ply + 1]
+                    if score >= beta:
+                        self.cutoffs += 1
+                        self.firstMoveCutoffs += movesSearched == 1
+                        if isQuiet(gs, move):
+                            self.ordering.updateQuietCutoff(move, color, ply, depth)
+                        break
+        if movesSearched == 0:
+            return -MATE_SCORE + ply if checked else 0 #checkmate or stalemate
+
+        if bestScore >= beta:
+            bound = LOWERBOUND
+        elif bestScore > alphaOrig:
+            bound = EXACT
+        else:
+            bound = UPPERBOUND
+        self.tt.store(key, depth, scoreToTT(bestScore, ply), bound, bestMove if bound != UPPERBOUND else 0)
+        return bestScore
+
+    #searches captures and promotions only until the position is quiet, so the evaluation isn't taken
+    #in the middle of an exchange. When in check every evasion is searched instead
+    def quiescence(self, alpha, beta, ply):
+        gs = self.gs
+        self.nodes += 1
+        self.qnodes += 1
+        if self.checkLimits and self.nodes & 1023 == 0:
+            self.checkBudget()
+        if self.stopped:
+            return 0
+        if ply >= MAX_PLY:
+            return evaluate(gs, self.pawnTable)
+        checked = inCheck(gs)
+        if checked:
+            moves = gs.getValidMoveCodes()
+            if not moves:
+                return -MATE_SCORE + ply
+            bestScore = -MATE_SCORE - 1
+        else:
+            #stand pat: the side to move doesn't have to capture, so the static score is a lower bound
+            bestScore = evaluate(gs, self.pawnTable)
+            if bestScore >= beta:
+                return bestScore
+            #delta pruning: even winning a queen wouldn't get back to alpha
+            if bestScore + PIECE_VALUES["Q"] + DELTA_MARGIN < alpha:
+                return bestScore
+            if bestScore > alpha:
+                alpha = bestScore
+            moves = gs.getValidMoveCodes(capturesOnly=True)
+            moves.sort(key=lambda move: captureScore(gs, move), reverse=True)
+        standPat = bestScore
+        for move in moves:
+            #delta pruning per capture: skip it if the piece won plus the margin still leaves us below alpha
+            if not checked and not move & chessengine.MOVE_PROMOTION and \
+                    standPat + victimValue(gs, move) + DELTA_MARGIN <= alpha:
+                continue
+            #captures that lose material in the exchange can't raise the score above standing pat
+            if not checked and isLosingCapture(gs, move):
+                continue
+            gs.makeMove(move)
+            score = -self.quiescence(-beta, -alpha, ply + 1)
+            gs.undoMove()
+            if self.stopped:
+                return 0
+            if score > bestScore:
+                bestScore = score
+                if score > alpha:
+                    alpha = score
+                    if score >= beta:
+                        break
+        return bestScore
+
+    #True if the moves played from the root so far are the start of the previous principal variation
+    def followingPv(self, ply):
+        movelog = self.gs.movelog
+        for i in range(ply):
+            if movelog[len(movelog) - ply + i] != self.rootPv[i]:
+                return False
+        return True
+
+
+#helper process of a ParallelSearch: searches the position until the main search sets stopEvent, then writes
+#the number of nodes it searched to nodeCounts[workerId]. The position comes in serialized form, options holds the
+#pruning, pvs and aspirationWindow arguments of Search and checkEval sets evaluation.CHECK_INCREMENTAL
+def helperSearch(data, ttName, ttSizeMB, workerId, stopEvent, nodeCounts, options, checkEval):
+    evaluation.CHECK_INCREMENTAL = checkEval
+    tt = SharedTranspositionTable(ttSizeMB, ttName)
+    try:
+        search = Search(chessengine.GameState.deserialize(data), tt=tt, workerId=workerId, stopEvent=stopEvent, **options)
+        search.search()
+        nodeCounts[workerId] = search.nodes
+    finally:
+        tt.close()
+
+
+#lazy SMP: the main search runs in this process with workers - 1 helper processes, all sharing one
+#transposition table in shared memory. The limits apply to the main search, the helpers stop with it.
+#pruning, pvs and aspirationWindow are passed on to the Search of every process
+class ParallelSearch():
+    def __init__(self, gs, workers=None, ttSizeMB=16, infoCallback=None, pruning=PRUNING, pvs=True,
+                 aspirationWindow=ASPIRATION_WINDOW):
+        for name in pruning:
+            if name not in PRUNING:
+                raise ValueError("unknown pruning technique %r" % name)
+        self.gs = gs
+        self.options = {"pruning": tuple(pruning), "pvs": pvs, "aspirationWindow": aspirationWindow}
+        self.workers = max(1, workers or os.cpu_count())
+        self.ttSizeMB = ttSizeMB
+        self.infoCallback = infoCallback
+        self.nodes = 0 #nodes searched by all the processes together
+        self.helperNodes = []
+        self.iterations = [] #reports of the main search's completed iterations
+        self.ttStats = {}
+        self.pawnStats = {} #pawn hash table of the main search
+
+    #same as Search.search, returns the best move found by the main search as a packed move code
+    def search(self, maxDepth=MAX_PLY - 1, timeLimit=None, nodeLimit=None):
+        tt = SharedTranspositionTable(self.ttSizeMB)
+        stopEvent = multiprocessing.Event()
+        nodeCounts = multiprocessing.Array("q", self.workers, lock=False)
+        data = self.gs.serialize()
+        helpers = [multiprocessing.Process(target=helperSearch, daemon=True,
+                                           args=(data, tt.name, self.ttSizeMB, workerId, stopEvent, nodeCounts,
+                                                 self.options, evaluation.CHECK_INCREMENTAL))
+                   for workerId in range(1, self.workers)]
+        start = time.perf_counter()
+        try:
+            for helper in helpers:
+                helper.start()
+            main = Search(self.gs, tt=tt, infoCallback=self.infoCallback, **self.options)
+            bestMove = main.search(maxDepth, timeLimit, nodeLimit)
+        finally:
+            stopEvent.set()
+            for helper in helpers:
+                helper.join()
+            self.ttStats = tt.stats()
+            tt.close()
+            tt.unlink()
+        self.time = time.perf_counter() - start
+        self.iterations = main.iterations
+        self.pawnStats = main.pawnTable.stats()
+        self.helperNodes = list(nodeCounts[1:])
+        self.nodes = main.nodes + sum(self.helperNodes)
+        return bestMove
+
+    #combined report of the last search
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "depth": self.iterations[-1]["depth"] if self.iterations else 0,
+            "nodes": self.nodes,
+            "mainNodes": self.nodes - sum(self.helperNodes),
+            "time": round(self.time, 4),
+            "nps": round(self.nodes / self.time) if self.time > 0 else 0,
+            "tt": self.ttStats,
+            "pawnHash": self.pawnStats,
+        }
+
+
+#picks a Move for the side to move within timeLimit seconds, workers > 1 runs a ParallelSearch.
+#main.py runs a Search itself on a copy of the position, in a thread of its own
+def findBestMove(gs, timeLimit=1.0, maxDepth=MAX_PLY - 1, workers=1):
+    search = ParallelSearch(gs, workers) if workers > 1 else Search(gs)
+    bestMove = search.search(maxDepth=maxDepth, timeLimit=timeLimit)
+    return gs.moveFromCode(bestMove) if bestMove is not None else None
+
+
+def main(argv=None):
+    from utilities.perft import POSITIONS, loadPosition
+    parser = argparse.ArgumentParser(description="Search a test position and report every iteration as JSON")
+    parser.add_argument("--position", action="append", choices=sorted(POSITIONS),
+                        help="position to search (can be repeated, default all)")
+    parser.add_argument("--depth", type=int, default=MAX_PLY - 1, help="maximum depth")
+    parser.add_argument("--time", type=float, default=None, help="seconds per position")
+    parser.add_argument("--nodes", type=int, default=None, help="node budget per position")
+    parser.add_argument("--hash", type=float, default=16, help="transposition table size in MB (default 16)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes searching in parallel (default 1, 0 uses every core)")
+    parser.add_argument("--no-pruning", action="append", choices=PRUNING, default=[],
+                        help="selective search technique to switch off (can be repeated)")
+    parser.add_argument("--no-pvs", action="store_true", help="search every move with the full window")
+    parser.add_argument("--aspiration", type=int, default=ASPIRATION_WINDOW,
+                        help="half width of the aspiration window (default %d, 0 for none)" % ASPIRATION_WINDOW)
+    parser.add_argument("--check-eval", action="store_true",
+                        help="check the incremental evaluation against a full recompute at every node")
+    args = parser.parse_args(argv)
+    evaluation.CHECK_INCREMENTAL = args.check_eval
+    pruning = [name for name in PRUNING if name not in args.no_pruning]
+    if args.time is None and args.nodes is None and args.depth == MAX_PLY - 1:
+        args.depth = 4
+    workers = args.workers or os.cpu_count()
+    for name in args.position or list(POSITIONS):
+        printInfo = lambda info, name=name: print(json.dumps(dict(position=name, **info)), flush=True)
+        options = {"pruning": pruning, "pvs": not args.no_pvs, "aspirationWindow": args.aspiration}
+        if workers > 1:
+            search = ParallelSearch(loadPosition(name), workers, ttSizeMB=args.hash, infoCallback=printInfo, **options)
+        else:
+            search = Search(loadPosition(name), ttSizeMB=args.hash, infoCallback=printInfo, **options)
+        bestMove = search.search(args.depth, args.time, args.nodes)
+        report = {"position": name, "bestmove": chessengine.moveNotation(bestMove) if bestMove is not None else None}
+        if workers > 1:
+            report.update(search.stats())
+        else:
+            report["tt"] = search.tt.stats()
+            report["pawnHash"] = search.pawnTable.stats()
+        print(json.dumps(report), flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
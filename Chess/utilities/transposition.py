@@ -0,0 +1,127 @@
+"""
+Transposition table: remembers the result of searching a position, keyed by GameState.zobristKey.
+The entries live in one preallocated array of 64-bit words, so the table never grows past the size it was
+created with. Each bucket holds two entries: the first is replaced only by a search at least as deep
+(depth-preferred), the second takes everything else (always-replace).
+SharedTranspositionTable keeps the same entries in a multiprocessing.shared_memory block, so the processes of
+a parallel search can all use one table. It has no locks: an entry stores its key XORed with its data, and a
+probe only accepts it if the two words still give back the key, so an entry half overwritten by another
+process reads as a miss instead of returning the wrong data.
+"""
+from array import array
+from multiprocessing import shared_memory
+
+#bound types, 0 marks an empty entry
+EXACT = 1 #the score is the exact value of the position
+LOWERBOUND = 2 #the search failed high, the real score is at least this
+UPPERBOUND = 3 #the search failed low, the real score is at most this
+
+#an entry is two words: the key XOR the packed data, then the packed data
+#data bits: 0-15 best move, 16-31 score + 32768, 32-39 depth, 40-41 bound
+ENTRY_WORDS = 2
+BUCKET_WORDS = 2 * ENTRY_WORDS
+BUCKET_BYTES = BUCKET_WORDS * 8
+MAX_DEPTH = 255
+MAX_SCORE = 32767
+
+
+class TranspositionTable():
+    def __init__(self, sizeMB=16):
+        self.sizeMB = sizeMB
+        self.buckets = max(1, int(sizeMB * 1024 * 1024) // BUCKET_BYTES)
+        self.table = array("Q", bytes(self.buckets * BUCKET_BYTES))
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0 #misses where the bucket was holding other positions
+        self.stores = 0
+
+    #empties the table and resets the counters
+    def clear(self):
+        self.table = array("Q", bytes(self.buckets * BUCKET_BYTES))
+        self.hits = self.misses = self.collisions = self.stores = 0
+
+    #returns (depth, score, bound, move) stored for the position key, or None
+    def probe(self, key):
+        table = self.table
+        i = (key % self.buckets) * BUCKET_WORDS
+        data = table[i + 1]
+        if not data or table[i] ^ data != key:
+            data = table[i + 3]
+            if not data or table[i + 2] ^ data != key:
+                self.misses += 1
+                if table[i + 1] or table[i + 3]:
+                    self.collisions += 1
+                return None
+        self.hits += 1
+        return (data >> 32) & 0xFF, ((data >> 16) & 0xFFFF) - 32768, (data >> 40) & 0x3, data & 0xFFFF
+
+    #stores a search result, move is a 16-bit move code (0 for none) and score must fit in +-MAX_SCORE
+    def store(self, key, depth, score, bound, move=0):
+        table = self.table
+        i = (key % self.buckets) * BUCKET_WORDS
+        depth = min(max(depth, 0), MAX_DEPTH)
+        data = move | (score + 32768) << 16 | depth << 32 | bound << 40
+        old = table[i + 1]
+        samePosition = old and table[i] ^ old == key
+        #depth-preferred slot: take it if empty, the same position, or the new search is at least as deep
+        if not old or samePosition or depth >= (old >> 32) & 0xFF:
+            if samePosition and not move: #keep the best move of a shallower search of the same position
+                data |= old & 0xFFFF
+            table[i] = key ^ data
+            table[i + 1] = data
+        else: #always-replace slot
+            table[i + 2] = key ^ data
+            table[i + 3] = data
+        self.stores += 1
+
+    #number of entries in use, per thousand (sampled from the first buckets like UCI hashfull)
+    def hashfull(self):
+        sample = min(self.buckets, 500)
+        used = sum(1 for i in range(0, sample * BUCKET_WORDS, ENTRY_WORDS) if self.table[i + 1])
+        return used * 1000 // (sample * 2)
+
+    def stats(self):
+        probes = self.hits + self.misses
+        return {
+            "sizeMB": self.sizeMB,
+            "entries": self.buckets * 2,
+            "hits": self.hits,
+            "misses": self.misses,
+            "collisions": self.collisions,
+            "stores": self.stores,
+            "hitRate": round(self.hits / probes, 4) if probes else 0.0,
+            "hashfull": self.hashfull(),
+        }
+
+
+#a TranspositionTable in shared memory. Created without a name it allocates a new block, the other processes
+#open the same block by passing its name. Every process has to close() it and the creator unlink() it at the end
+class SharedTranspositionTable(TranspositionTable):
+    def __init__(self, sizeMB=16, name=None):
+        self.sizeMB = sizeMB
+        self.buckets = max(1, int(sizeMB * 1024 * 1024) // BUCKET_BYTES)
+        size = self.buckets * BUCKET_BYTES
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=size)
+            self.memory.buf[:size] = bytes(size)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.name = self.memory.name
+        self.table = self.memory.buf[:size].cast("Q")
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    #empties the table for every process using it and resets this process's counters
+    def clear(self):
+        size = self.buckets * BUCKET_BYTES
+        self.memory.buf[:size] = bytes(size)
+        self.hits = self.misses = self.collisions = self.stores = 0
+
+    def close(self):
+        self.table.release()
+        self.memory.close()
+
+    def unlink(self):
+        self.memory.unlink()